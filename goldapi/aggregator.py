@@ -0,0 +1,184 @@
+import time
+import logging
+import statistics
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .breaker import CircuitBreaker
+from .providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+# Seconds all providers together get to answer
+FETCH_DEADLINE = getattr(settings, 'GOLD_PRICE_FETCH_DEADLINE', 8)
+# Agreeing providers needed to accept a price, capped at the number of sources
+QUORUM = getattr(settings, 'GOLD_PRICE_QUORUM', 1)
+# Fraction a price may differ from the median and still count as agreeing
+MAX_DEVIATION = getattr(settings, 'GOLD_PRICE_MAX_DEVIATION', 0.05)
+
+AggregatedPrice = namedtuple('AggregatedPrice', ['price', 'timestamp', 'providers'])
+
+
+class PriceAggregationError(Exception):
+    """Raised when too few providers agree on a price."""
+
+
+class ProviderHealth:
+    """
+    Latency and error rate of each provider as exponentially weighted
+    averages, kept in Redis so every Celery worker shares them. Providers
+    are tried best score first; skipping failing ones is left to
+    CircuitBreaker.
+    """
+    KEY_PREFIX = 'gold-price-provider-health'
+    ALPHA = 0.3
+
+    def __init__(self, cache_name='default'):
+        self.cache_name = cache_name
+
+    def key(self, provider_name):
+        return f"{self.KEY_PREFIX}:{provider_name}"
+
+    @staticmethod
+    def _parse(raw):
+        return {
+            'latency_ms': float(raw.get(b'latency_ms', 0)),
+            'error_rate': float(raw.get(b'error_rate', 0)),
+            'last_attempt': int(raw.get(b'last_attempt', 0)),
+            'attempts': int(raw.get(b'attempts', 0)),
+        }
+
+    def get_all(self, provider_names):
+        """
+        Returns:
+            dict: provider name -> latency_ms, error_rate, last_attempt (ms) and attempts
+        """
+        try:
+            pipeline = get_redis_connection(self.cache_name).pipeline(transaction=False)
+            for provider_name in provider_names:
+                pipeline.hgetall(self.key(provider_name))
+            raw_stats = pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Could not read gold price provider health: {str(e)}")
+            raw_stats = [{} for _ in provider_names]
+        return {name: self._parse(raw) for name, raw in zip(provider_names, raw_stats)}
+
+    def record(self, provider_name, ok, latency_ms, stats=None):
+        """Fold one attempt into the provider's averages."""
+        if stats is None:
+            stats = self.get_all([provider_name])[provider_name]
+        if stats['attempts']:
+            latency_ms = stats['latency_ms'] + self.ALPHA * (latency_ms - stats['latency_ms'])
+            error_rate = stats['error_rate'] + self.ALPHA * ((0 if ok else 1) - stats['error_rate'])
+        else:
+            error_rate = 0 if ok else 1
+        try:
+            get_redis_connection(self.cache_name).hset(self.key(provider_name), mapping={
+                'latency_ms': round(latency_ms, 1),
+                'error_rate': round(error_rate, 4),
+                'last_attempt': int(time.time() * 1000),
+                'attempts': stats['attempts'] + 1,
+            })
+        except Exception as e:
+            logger.warning(f"Could not record gold price provider health: {str(e)}")
+
+    @staticmethod
+    def score(stats):
+        """Lower is better: latency, penalized by the error rate."""
+        return stats['latency_ms'] * (1 + 4 * stats['error_rate'])
+
+
+def _timed_fetch(provider_name, timeout):
+    started = time.monotonic()
+    try:
+        price, timestamp = get_provider(provider_name, timeout=timeout).get_price()
+        if price is None or timestamp is None:
+            raise ValueError("provider returned None for price or timestamp")
+        return True, (price, timestamp), (time.monotonic() - started) * 1000
+    except Exception as e:
+        logger.warning(f"Gold price provider {provider_name} failed: {str(e)}")
+        return False, None, (time.monotonic() - started) * 1000
+
+
+def fetch_prices(provider_names, deadline=FETCH_DEADLINE, health=None, breaker=None):
+    """
+    Fetch concurrently from every provider whose circuit allows it and
+    return what arrived before the deadline. Providers still running at the
+    deadline count as failures and their results are ignored.
+
+    Returns:
+        dict: provider name -> (price, timestamp_ms), empty when every circuit is open
+    """
+    if health is None:
+        health = ProviderHealth()
+    if breaker is None:
+        breaker = CircuitBreaker()
+    provider_names = list(provider_names)
+    stats = health.get_all(provider_names)
+    states = breaker.get_all(provider_names)
+
+    now_ms = int(time.time() * 1000)
+    candidates = [name for name in provider_names if breaker.allow(name, states[name], now_ms)]
+    if not candidates:
+        logger.warning(f"Skipping gold price fetch, circuits open for {', '.join(provider_names)}")
+        return {}
+    candidates.sort(key=lambda name: health.score(stats[name]))
+
+    executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix='gold-price-fetch')
+    futures = {executor.submit(_timed_fetch, name, deadline): name for name in candidates}
+    done, pending = wait(futures, timeout=deadline)
+    # Don't wait for stragglers, their requests end at their own timeout
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for future in done:
+        name = futures[future]
+        ok, result, latency_ms = future.result()
+        health.record(name, ok, latency_ms, stats[name])
+        if ok:
+            breaker.record_success(name, states[name])
+            results[name] = result
+        else:
+            breaker.record_failure(name, states[name])
+    for future in pending:
+        name = futures[future]
+        logger.warning(f"Gold price provider {name} missed the {deadline}s deadline")
+        health.record(name, False, deadline * 1000, stats[name])
+        breaker.record_failure(name, states[name])
+    return results
+
+
+def aggregate_prices(results, quorum=QUORUM, max_deviation=MAX_DEVIATION):
+    """
+    Combine provider prices: drop prices more than max_deviation away from
+    the median and take the median of the rest.
+
+    Args:
+        results (dict): provider name -> (price, timestamp_ms)
+        quorum (int): Agreeing providers required
+
+    Returns:
+        AggregatedPrice: price, newest timestamp and the providers used
+
+    Raises:
+        PriceAggregationError: If fewer than quorum providers agree
+    """
+    if not results:
+        raise PriceAggregationError("No provider returned a price")
+
+    median = statistics.median(price for price, _ in results.values())
+    agreeing = {
+        name: (price, timestamp) for name, (price, timestamp) in results.items()
+        if abs(price - median) <= median * max_deviation
+    }
+    if len(agreeing) < quorum:
+        raise PriceAggregationError(
+            f"Only {len(agreeing)} of {len(results)} providers agree on the gold price, {quorum} required"
+        )
+
+    price = int(statistics.median(price for price, _ in agreeing.values()))
+    timestamp = max(timestamp for _, timestamp in agreeing.values())
+    return AggregatedPrice(price, timestamp, sorted(agreeing))
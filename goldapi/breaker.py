@@ -0,0 +1,110 @@
+import time
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker, kept in Redis so every Celery worker
+    shares it.
+
+    After FAILURE_THRESHOLD consecutive failures the circuit opens and the
+    provider is not called for a backoff that doubles on every trip, from
+    BASE_BACKOFF up to MAX_BACKOFF seconds. Once the backoff has passed the
+    circuit is half-open: a single probe call is let through, closing the
+    circuit on success and opening it again with a longer backoff on failure.
+    """
+    KEY_PREFIX = 'gold-price-breaker'
+    FAILURE_THRESHOLD = getattr(settings, 'GOLD_PRICE_BREAKER_THRESHOLD', 3)
+    BASE_BACKOFF = getattr(settings, 'GOLD_PRICE_BREAKER_BACKOFF', 30)
+    MAX_BACKOFF = getattr(settings, 'GOLD_PRICE_BREAKER_MAX_BACKOFF', 30 * 60)
+    # Seconds a half-open probe holds its slot, longer than any fetch
+    PROBE_TTL = 60
+
+    def __init__(self, cache_name='default'):
+        self.cache_name = cache_name
+
+    def key(self, provider_name):
+        return f"{self.KEY_PREFIX}:{provider_name}"
+
+    @staticmethod
+    def _parse(raw):
+        return {
+            'failures': int(raw.get(b'failures', 0)),
+            'trips': int(raw.get(b'trips', 0)),
+            'open_until': int(raw.get(b'open_until', 0)),
+        }
+
+    def get_all(self, provider_names):
+        """
+        Returns:
+            dict: provider name -> failures, trips and open_until (ms, 0 when closed)
+        """
+        try:
+            pipeline = get_redis_connection(self.cache_name).pipeline(transaction=False)
+            for provider_name in provider_names:
+                pipeline.hgetall(self.key(provider_name))
+            raw_states = pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Could not read gold price circuit breakers: {str(e)}")
+            raw_states = [{} for _ in provider_names]
+        return {name: self._parse(raw) for name, raw in zip(provider_names, raw_states)}
+
+    @staticmethod
+    def status(state, now_ms):
+        if not state['open_until']:
+            return CLOSED
+        return OPEN if now_ms < state['open_until'] else HALF_OPEN
+
+    def allow(self, provider_name, state, now_ms):
+        """
+        Whether the provider may be called now. In the half-open state only
+        the caller that claims the probe slot is allowed.
+        """
+        status = self.status(state, now_ms)
+        if status == CLOSED:
+            return True
+        if status == OPEN:
+            return False
+        try:
+            return bool(get_redis_connection(self.cache_name).set(
+                f"{self.key(provider_name)}:probe", 1, nx=True, ex=self.PROBE_TTL
+            ))
+        except Exception as e:
+            logger.warning(f"Could not claim gold price probe for {provider_name}: {str(e)}")
+            return True
+
+    def record_success(self, provider_name, state):
+        if state['failures'] or state['open_until']:
+            logger.info(f"Gold price circuit for {provider_name} closed")
+        self._save(provider_name, {'failures': 0, 'trips': 0, 'open_until': 0})
+
+    def record_failure(self, provider_name, state):
+        now_ms = int(time.time() * 1000)
+        failures = state['failures'] + 1
+        trips = state['trips']
+        open_until = state['open_until']
+        # A failed half-open probe trips again straight away
+        if failures >= self.FAILURE_THRESHOLD or open_until:
+            trips += 1
+            backoff = min(self.BASE_BACKOFF * 2 ** (trips - 1), self.MAX_BACKOFF)
+            open_until = now_ms + backoff * 1000
+            logger.warning(f"Gold price circuit for {provider_name} opened for {backoff}s after {failures} failures")
+        self._save(provider_name, {'failures': failures, 'trips': trips, 'open_until': open_until})
+
+    def _save(self, provider_name, state):
+        try:
+            pipeline = get_redis_connection(self.cache_name).pipeline(transaction=True)
+            pipeline.hset(self.key(provider_name), mapping=state)
+            pipeline.delete(f"{self.key(provider_name)}:probe")
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Could not save gold price circuit breaker of {provider_name}: {str(e)}")
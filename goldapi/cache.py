@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger(__name__)
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'loaded_at', 'ttl'])
+
+
+class PriceCache:
+    """
+    In-process cache for a single gold price value.
+
+    Reads are lock-free: the current entry is an immutable tuple that is
+    replaced atomically. Once an entry is older than ``ttl`` a single caller
+    refreshes it (single flight) while concurrent callers keep getting the
+    stale value, as long as it is inside the ``grace`` window. Past the grace
+    window callers wait for the refresh in progress instead of all calling
+    the loader at once.
+    """
+
+    def __init__(self, loader, ttl=5, grace=60, fallback=None):
+        """
+        Initialize the cache.
+
+        Args:
+            loader (callable): Returns a fresh value, may raise
+            ttl (float): Seconds an entry is served without refreshing
+            grace (float): Seconds past ttl a stale entry is still served while refreshing
+            fallback (callable, optional): Value used when loading fails and nothing is cached
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.grace = grace
+        self.fallback = fallback
+        self._entry = None
+        self._retry_at = 0
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, stale_hits, misses, refreshes and errors counters
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def get(self):
+        entry = self._entry
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            if age < entry.ttl:
+                self._count('hits')
+                return entry.value
+            if age < entry.ttl + self.grace:
+                self._count('stale_hits')
+                # Only the caller that wins the lock refreshes, the others return the stale value
+                if time.monotonic() >= self._retry_at and self._refresh_lock.acquire(blocking=False):
+                    try:
+                        return self._refresh(entry)
+                    finally:
+                        self._refresh_lock.release()
+                return entry.value
+
+        self._count('misses')
+        with self._refresh_lock:
+            # Another caller may have refreshed while we were waiting for the lock
+            current = self._entry
+            if current is not None and time.monotonic() - current.loaded_at < current.ttl:
+                return current.value
+            return self._refresh(current)
+
+    async def aget(self):
+        """Asyncio variant of get(); only refreshes run in a worker thread."""
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry.loaded_at < entry.ttl:
+            self._count('hits')
+            return entry.value
+        return await sync_to_async(self.get, thread_sensitive=False)()
+
+    def set(self, value, ttl=None):
+        """
+        Store a value pushed from elsewhere, e.g. a price update notification.
+
+        Args:
+            value: The new value
+            ttl (float, optional): Seconds the value stays fresh, defaults to the cache ttl
+        """
+        self._entry = CacheEntry(value, time.monotonic(), self.ttl if ttl is None else ttl)
+
+    def expire(self):
+        """
+        Shorten the current entry back to the cache ttl, e.g. once pushed
+        updates stop arriving, so polling takes over again.
+        """
+        entry = self._entry
+        if entry is not None and entry.ttl > self.ttl:
+            self._entry = entry._replace(ttl=self.ttl)
+
+    def invalidate(self):
+        self._entry = None
+
+    def _refresh(self, stale_entry):
+        """Load a fresh value; must be called with the refresh lock held."""
+        self._count('refreshes')
+        try:
+            value = self.loader()
+        except Exception as e:
+            self._count('errors')
+            logger.error(f"Error refreshing price cache: {str(e)}")
+            # Back off for one ttl before the next attempt
+            self._retry_at = time.monotonic() + self.ttl
+            if stale_entry is not None and time.monotonic() - stale_entry.loaded_at < stale_entry.ttl + self.grace:
+                return stale_entry.value
+            if self.fallback is None:
+                raise
+            value = self.fallback()
+        self._entry = CacheEntry(value, time.monotonic(), self.ttl)
+        return value
@@ -1,4 +1,3 @@
-import time
 import requests
 from bs4 import BeautifulSoup
 from django.core.cache import caches
@@ -7,10 +6,17 @@ from celery import shared_task
 import logging
 import traceback
 from django.conf import settings
-from functools import wraps
+from functools import wraps, partial
+from collections import namedtuple
+import threading
 
-from .providers import get_provider
+from .aggregator import FETCH_DEADLINE, QUORUM, fetch_prices, aggregate_prices
+from .cache import PriceCache
+from .history import HISTORY_BATCH_SIZE, flush_price_history
+from .providers import PROVIDERS
+from .schedule import AdaptiveSchedule
 from .repository import PriceRepository
+from .subscriber import get_price_subscriber
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -18,26 +24,142 @@ logger = logging.getLogger(__name__)
 # Get default provider name from settings or use 'tgju' as default
 DEFAULT_PROVIDER = getattr(settings, 'GOLD_PRICE_PROVIDER', 'tgju')
 
-# Cache storage
-_price_cache = {
-    'value': None,
-    'timestamp': 0,
-    'provider': None
-}
+
+class PriceSnapshot(namedtuple('PriceSnapshot', ['price', 'timestamp', 'provider', 'stale', 'epoch'],
+                               defaults=(False, 0))):
+    """
+    A gold price together with the provider and the time it was fetched at.
+    Every price computed from the same snapshot is consistent.
+    
+    stale is True when the price is the last known good one, older than
+    GOLD_PRICE_MAX_AGE, or no price is known at all (price 0).
+    
+    epoch is the price epoch the price was saved in; it only moves when the
+    price changes, while the timestamp moves on every update.
+    """
+    __slots__ = ()
+
+    @property
+    def id(self):
+        return f"{self.provider}:{self.timestamp}"
+
+    @property
+    def version(self):
+        """
+        Cache key part for everything priced from this snapshot: the same for
+        every update until the price changes.
+        """
+        if not self.epoch:
+            # Saved before epochs existed, or no price at all
+            return self.id
+        return f"{self.provider}:e{self.epoch}"
+
+
+def get_provider_names():
+    """
+    Names prices are kept under: the default provider, the providers
+    aggregated in GOLD_PRICE_SOURCES and every registered provider.
+    """
+    return {DEFAULT_PROVIDER, *getattr(settings, 'GOLD_PRICE_SOURCES', {}), *PROVIDERS}
+
+
+# Seconds a price is served from process memory, and how long past that a
+# stale price is still served while a single caller refreshes it
+PRICE_CACHE_TTL = getattr(settings, 'GOLD_PRICE_CACHE_TTL', 5)
+PRICE_CACHE_GRACE = getattr(settings, 'GOLD_PRICE_CACHE_GRACE', 60)
+# Seconds a pushed price stays fresh; longer than the longest update interval
+# so polling only resumes when pushed updates stop arriving
+PRICE_PUSH_TTL = getattr(settings, 'GOLD_PRICE_PUSH_TTL', AdaptiveSchedule.MAX_INTERVAL + 60)
+
+# Cache storage, one PriceCache per provider
+_price_caches = {}
+_price_caches_lock = threading.Lock()
 
 def _get_gold_price_from_redis(provider_name):
     """
-    Internal function to get gold price from Redis.
+    Internal function to get gold price snapshot from Redis.
+    
+    An outdated price is still returned, flagged as stale, rather than
+    quoting products at 0.
+    
+    Raises:
+        SuspiciousOperation: If no price is available
     """
-    try:
-        repository = PriceRepository(provider_name=provider_name)
-        return repository.get_price()
-    except SuspiciousOperation as e:
-        logger.warning(f"Could not get gold price: {str(e)}")
-        return 0
-    except Exception as e:
-        logger.error(f"Unexpected error getting gold price: {str(e)}")
-        return 0
+    repository = PriceRepository(provider_name=provider_name)
+    price, timestamp, stale, epoch = repository.get_latest_record()
+    if stale:
+        logger.warning(f"Serving last known good gold price of {provider_name} from {timestamp}")
+    return PriceSnapshot(price, timestamp, provider_name, stale, epoch)
+
+def get_price_cache(provider_name=None):
+    """
+    Get the process-wide price cache of a provider, creating it on first use.
+    """
+    if provider_name is None:
+        provider_name = DEFAULT_PROVIDER
+    
+    price_cache = _price_caches.get(provider_name)
+    if price_cache is None:
+        with _price_caches_lock:
+            price_cache = _price_caches.get(provider_name)
+            if price_cache is None:
+                price_cache = PriceCache(
+                    loader=partial(_get_gold_price_from_redis, provider_name),
+                    ttl=PRICE_CACHE_TTL,
+                    grace=PRICE_CACHE_GRACE,
+                    fallback=lambda: PriceSnapshot(0, 0, provider_name, True),
+                )
+                _price_caches[provider_name] = price_cache
+    
+    get_price_subscriber(on_start=_register_price_listeners)
+    return price_cache
+
+def _on_price_update(update):
+    """
+    Store a price published by update_gold_price in the local cache.
+    Unknown provider names are ignored rather than given a cache each.
+    """
+    if update['provider'] not in get_provider_names():
+        logger.warning(f"Ignoring gold price update of unknown provider {update['provider']}")
+        return
+    snapshot = PriceSnapshot(update['price'], update['timestamp'], update['provider'], epoch=update['epoch'])
+    get_price_cache(snapshot.provider).set(snapshot, ttl=PRICE_PUSH_TTL)
+
+def _on_price_subscription_lost():
+    """
+    Fall back to polling Redis until the subscription is back.
+    """
+    for price_cache in list(_price_caches.values()):
+        price_cache.expire()
+
+def _register_price_listeners(subscriber):
+    subscriber.add_listener(_on_price_update, _on_price_subscription_lost)
+
+def get_price_cache_stats():
+    """
+    Returns:
+        dict: provider name -> hit, stale hit, miss, refresh and error counters
+    """
+    return {name: price_cache.stats() for name, price_cache in _price_caches.items()}
+
+def get_gold_price_snapshot(provider_name=None):
+    """
+    Get gold price snapshot with local memory caching.
+    
+    Args:
+        provider_name (str, optional): Name of the provider to use.
+                                      If None, uses the default provider from settings.
+                                      
+    Returns:
+        PriceSnapshot: Gold price, its timestamp and provider
+    """
+    return get_price_cache(provider_name).get()
+
+async def aget_gold_price_snapshot(provider_name=None):
+    """
+    Asyncio variant of get_gold_price_snapshot.
+    """
+    return await get_price_cache(provider_name).aget()
 
 def get_gold_price(provider_name=None):
     """
@@ -50,83 +172,100 @@ def get_gold_price(provider_name=None):
     Returns:
         int: Gold price
     """
-    if provider_name is None:
-        provider_name = DEFAULT_PROVIDER
-    
-    current_time = time.time()
-    cache_ttl = 5  # 5 seconds TTL
-    
-    # Check if we have a valid cached value
-    if (_price_cache['value'] is not None and 
-        _price_cache['provider'] == provider_name and
-        current_time - _price_cache['timestamp'] < cache_ttl):
-        return _price_cache['value']
-    
-    # Get fresh value from Redis
-    price = _get_gold_price_from_redis(provider_name)
-    
-    # Update cache
-    _price_cache.update({
-        'value': price,
-        'timestamp': current_time,
-        'provider': provider_name
-    })
-    
-    return price
+    return get_gold_price_snapshot(provider_name).price
 
 @shared_task
-def update_gold_price(provider_name=None):
+def update_gold_price(provider_name=None, force=False):
     """
     Periodic task to update gold price in Redis.
     
+    The price is fetched concurrently from the sources configured for the
+    provider in GOLD_PRICE_SOURCES (just the provider itself by default)
+    under one deadline, and their median is saved under the provider name.
+    
+    Beat calls this often; updates only happen when the provider's
+    AdaptiveSchedule says one is due, sooner while the price is moving.
+    
+    A price that differs from the saved one starts a new price epoch, which
+    invalidates every response cached with the previous price.
+    
     Args:
         provider_name (str, optional): Name of the provider to use. 
                                       If None, uses the default provider from settings.
+        force (bool): Update even if the schedule says it is not due
                                       
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if successful, False otherwise, None if no update was due
     """
     if provider_name is None:
         provider_name = DEFAULT_PROVIDER
     
-    logger.info(f"Starting gold price update from {provider_name}")
+    schedule = AdaptiveSchedule(provider_name)
+    schedule_state = schedule.get_state()
+    if not force and not schedule.is_due(schedule_state):
+        return None
+    
+    sources = getattr(settings, 'GOLD_PRICE_SOURCES', {}).get(provider_name) or [provider_name]
+    logger.info(f"Starting gold price update from {', '.join(sources)}")
     
     try:
-        # Get provider instance
-        provider = get_provider(provider_name)
-        logger.debug(f"Using provider: {provider.name}")
-        
         # Get repository for the provider
         repository = PriceRepository(provider_name=provider_name)
         
-        # Get price from provider
+        # Get price from the sources
         try:
-            price, timestamp = provider.get_price()
-            logger.info(f"Retrieved price: {price}, timestamp: {timestamp}")
-            
-            if price is None or timestamp is None:
-                logger.error(f"Provider {provider_name} returned None for price or timestamp")
-                return False
-                
+            results = fetch_prices(sources, deadline=FETCH_DEADLINE)
+            price, timestamp, used = aggregate_prices(results, quorum=min(QUORUM, len(sources)))
+            logger.info(f"Retrieved price: {price}, timestamp: {timestamp} from {', '.join(used)}")
         except Exception as e:
-            logger.error(f"Error getting price from {provider_name}: {str(e)}")
-            logger.debug(traceback.format_exc())
+            logger.error(f"Error getting price from {', '.join(sources)}: {str(e)}")
+            schedule.schedule_next(failed=True, state=schedule_state)
             return False
         
+        try:
+            previous_price, _, _, epoch = repository.get_latest_record()
+        except SuspiciousOperation:
+            previous_price, epoch = None, 0
+        
         # Save price to repository
         try:
-            success = repository.save_price(price, timestamp)
+            if price != previous_price or not epoch:
+                epoch = repository.next_epoch()
+            success = repository.save_price(price, timestamp, epoch)
             if success:
-                logger.info(f"Successfully updated gold price from {provider_name}: {price}")
+                delay = schedule.schedule_next(price, previous_price, state=schedule_state)
+                logger.info(f"Successfully updated gold price from {provider_name}: {price}, next update in {delay:.0f}s")
             else:
                 logger.error(f"Failed to save gold price from {provider_name}")
+                schedule.schedule_next(failed=True, state=schedule_state)
             return success
         except Exception as e:
             logger.error(f"Error saving gold price: {str(e)}")
             logger.debug(traceback.format_exc())
+            schedule.schedule_next(failed=True, state=schedule_state)
             return False
             
     except Exception as e:
         logger.error(f"Error updating gold price from {provider_name}: {str(e)}")
         logger.debug(traceback.format_exc())
-        return False
\ No newline at end of file
+        schedule.schedule_next(failed=True, state=schedule_state)
+        return False
+
+@shared_task
+def flush_gold_price_history(batch_size=HISTORY_BATCH_SIZE):
+    """
+    Periodic task to move buffered prices into the history tables and
+    refresh their rollups.
+    
+    Returns:
+        int: Number of prices written
+    """
+    try:
+        written = flush_price_history(batch_size=batch_size)
+        if written:
+            logger.info(f"Wrote {written} gold prices to history")
+        return written
+    except Exception as e:
+        logger.error(f"Error flushing gold price history: {str(e)}")
+        logger.debug(traceback.format_exc())
+        return 0
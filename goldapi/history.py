@@ -0,0 +1,154 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from .models import GoldPriceTick, GoldPriceRollup
+from .repository import HISTORY_BUFFER_KEY, decode_record
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {
+    '1m': timedelta(minutes=1),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+# Records moved from the Redis buffer to the database per transaction
+HISTORY_BATCH_SIZE = 1000
+
+
+def to_datetime(timestamp_ms):
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+
+
+def bucket_start(moment, resolution):
+    """Start of the bucket of a resolution that contains moment, in UTC."""
+    step = int(RESOLUTIONS[resolution].total_seconds())
+    seconds = int(moment.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % step, tz=timezone.utc)
+
+
+def _take_buffered_records(redis_client, batch_size):
+    pipeline = redis_client.pipeline(transaction=True)
+    pipeline.lrange(HISTORY_BUFFER_KEY, 0, batch_size - 1)
+    pipeline.ltrim(HISTORY_BUFFER_KEY, batch_size, -1)
+    records, _ = pipeline.execute()
+    return records
+
+
+def flush_price_history(batch_size=HISTORY_BATCH_SIZE, cache_name='default'):
+    """
+    Move buffered price records into GoldPriceTick in batches and refresh the
+    rollups of every bucket they fall into.
+
+    Ticks already stored, e.g. a record buffered twice, are skipped: the
+    stored timestamps of each provider within the batch's span are read
+    with a range scan on the BRIN index.
+
+    A batch that fails to be written is put back at the head of the buffer.
+
+    Returns:
+        int: Number of records written
+    """
+    redis_client = get_redis_connection(cache_name)
+    written = 0
+    while True:
+        records = _take_buffered_records(redis_client, batch_size)
+        if not records:
+            break
+
+        try:
+            ticks = {}
+            spans = {}
+            for data in records:
+                try:
+                    price, timestamp, provider_name, _ = decode_record(data)
+                except (ValueError, UnicodeDecodeError):
+                    logger.error(f"Dropping invalid gold price record {data!r}")
+                    continue
+                moment = to_datetime(timestamp)
+                ticks[provider_name, moment] = GoldPriceTick(provider=provider_name, price=price, timestamp=moment)
+                start, end = spans.get(provider_name, (moment, moment))
+                spans[provider_name] = (min(start, moment), max(end, moment))
+
+            with transaction.atomic():
+                for provider_name, (start, end) in spans.items():
+                    stored = GoldPriceTick.objects.filter(
+                        provider=provider_name, timestamp__gte=start, timestamp__lte=end
+                    ).values_list('timestamp', flat=True)
+                    for moment in stored:
+                        ticks.pop((provider_name, moment), None)
+                GoldPriceTick.objects.bulk_create(ticks.values())
+                for provider_name, (start, end) in spans.items():
+                    update_rollups(provider_name, start, end)
+        except Exception:
+            redis_client.lpush(HISTORY_BUFFER_KEY, *reversed(records))
+            raise
+
+        written += len(ticks)
+        if len(records) < batch_size:
+            break
+    return written
+
+
+def update_rollups(provider_name, start, end):
+    """
+    Recompute every rollup bucket of a provider touched by ticks between
+    start and end. Whole days are recomputed, so the daily bucket and all
+    the minute and hour buckets inside it stay consistent.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    start = bucket_start(start, '1d')
+    end = bucket_start(end, '1d') + RESOLUTIONS['1d']
+    ticks = list(
+        GoldPriceTick.objects
+        .filter(provider=provider_name, timestamp__gte=start, timestamp__lt=end)
+        .order_by('timestamp')
+        .values_list('timestamp', 'price')
+    )
+
+    rollups = []
+    for resolution in RESOLUTIONS:
+        buckets = {}
+        for timestamp, price in ticks:
+            bucket = bucket_start(timestamp, resolution)
+            ohlc = buckets.get(bucket)
+            if ohlc is None:
+                buckets[bucket] = [price, price, price, price, 1]
+            else:
+                ohlc[1] = max(ohlc[1], price)
+                ohlc[2] = min(ohlc[2], price)
+                ohlc[3] = price
+                ohlc[4] += 1
+        rollups.extend(
+            GoldPriceRollup(
+                provider=provider_name, resolution=resolution, bucket=bucket,
+                open=ohlc[0], high=ohlc[1], low=ohlc[2], close=ohlc[3], samples=ohlc[4],
+            )
+            for bucket, ohlc in buckets.items()
+        )
+
+    GoldPriceRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['provider', 'resolution', 'bucket'],
+        update_fields=['open', 'high', 'low', 'close', 'samples'],
+        batch_size=1000,
+    )
+    return len(rollups)
+
+
+def get_price_history(provider_name, resolution, start, end):
+    """
+    Rollups of a provider at a resolution with start <= bucket < end, oldest first.
+    """
+    return (
+        GoldPriceRollup.objects
+        .filter(provider=provider_name, resolution=resolution, bucket__gte=start, bucket__lt=end)
+        .order_by('bucket')
+        .values('bucket', 'open', 'high', 'low', 'close', 'samples')
+    )
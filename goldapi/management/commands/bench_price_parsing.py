@@ -0,0 +1,108 @@
+import os
+import time
+import tracemalloc
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from goldapi.providers import TGJUGoldProvider, extract_cell_text, extract_cell_text_soup
+from goldapi.stubserver import StubPriceServer, build_price_page
+
+CHUNK_SIZE = 8192
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks streaming price extraction against the full BeautifulSoup parse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='*',
+                            help='Saved price pages; synthetic TGJU-format pages are used when omitted')
+        parser.add_argument('--repeat', type=int, default=20, help='Best of N runs')
+        parser.add_argument('--http', type=int, default=0,
+                            help='Also fetch this many times from a local stub server, per path')
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def peak_memory(self, func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def load_pages(self, fixtures):
+        if not fixtures:
+            return [
+                ('small, cell early', build_price_page(5_000_000, 2_000, 20_000)),
+                ('300KB, cell at 30%', build_price_page(5_000_000, 90_000, 210_000)),
+                ('300KB, cell at end', build_price_page(5_000_000, 300_000, 0)),
+            ]
+        pages = []
+        for path in fixtures:
+            with open(path, 'rb') as fixture:
+                pages.append((os.path.basename(path), fixture.read()))
+        return pages
+
+    def handle(self, *args, **options):
+        data_col = TGJUGoldProvider.DATA_COL
+        selector = f'[data-col="{data_col}"]'
+
+        self.stdout.write(
+            f"{'page':<22} {'size':>8} {'soup':>10} {'stream':>10} {'speedup':>8} "
+            f"{'soup peak':>10} {'stream peak':>12}"
+        )
+        for label, page in self.load_pages(options['fixtures']):
+            chunks = [page[i:i + CHUNK_SIZE] for i in range(0, len(page), CHUNK_SIZE)]
+
+            def soup():
+                return extract_cell_text_soup(page.decode('utf-8'), selector)
+
+            def stream():
+                return extract_cell_text(iter(chunks), data_col)
+
+            if soup() != stream():
+                raise CommandError(f'Streaming extraction differs from BeautifulSoup for {label}')
+
+            soup_time = self.best_of(options['repeat'], soup)
+            stream_time = self.best_of(options['repeat'], stream)
+            self.stdout.write(
+                f"{label:<22} {len(page) // 1024:>6}KB {soup_time * 1000:>8.2f}ms {stream_time * 1000:>8.2f}ms "
+                f"{soup_time / stream_time:>7.1f}x {self.peak_memory(soup) // 1024:>8}KB "
+                f"{self.peak_memory(stream) // 1024:>10}KB"
+            )
+
+        if options['http']:
+            self.bench_http(options['http'], selector)
+
+        self.stdout.write(self.style.SUCCESS('Streaming extraction matches BeautifulSoup.'))
+
+    def bench_http(self, count, selector):
+        server = StubPriceServer(5_000_000, padding_before=90_000, padding_after=210_000).start()
+        try:
+            provider = TGJUGoldProvider(url=server.url, name='bench')
+
+            def previous_path():
+                response = requests.get(server.url, headers=TGJUGoldProvider.HEADERS, timeout=10)
+                return TGJUGoldProvider.parse_price_text(extract_cell_text_soup(response.text, selector))
+
+            def streaming_path():
+                return provider.get_price()[0]
+
+            if previous_path() != streaming_path():
+                raise CommandError('Streaming fetch returned a different price')
+
+            for label, func in (('requests.get + soup', previous_path), ('session + stream', streaming_path)):
+                start = time.perf_counter()
+                for _ in range(count):
+                    func()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{label:<22} {elapsed / count * 1000:>8.2f}ms per fetch over {count} fetches")
+        finally:
+            server.stop()
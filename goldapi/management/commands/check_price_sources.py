@@ -0,0 +1,77 @@
+import time
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from goldapi.aggregator import FETCH_DEADLINE, ProviderHealth, PriceAggregationError, fetch_prices, aggregate_prices
+from goldapi.breaker import CircuitBreaker
+from goldapi.providers import TGJUGoldProvider, register_provider
+from goldapi.stubserver import StubPriceServer
+
+
+class Command(BaseCommand):
+    help = 'Fetches the gold price from several sources concurrently and shows the aggregate and provider health'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='*', help='Providers to fetch from, ignored with --stub')
+        parser.add_argument('--stub', type=int, default=0, help='Fetch from this many local stub servers instead')
+        parser.add_argument('--slow', type=int, default=0, help='Stub servers answering after the deadline')
+        parser.add_argument('--failing', type=int, default=0, help='Stub servers answering with HTTP 503')
+        parser.add_argument('--outliers', type=int, default=0, help='Stub servers quoting a price 20%% off')
+        parser.add_argument('--price', type=int, default=5_000_000, help='Price quoted by the stub servers')
+        parser.add_argument('--deadline', type=float, default=FETCH_DEADLINE)
+        parser.add_argument('--quorum', type=int, default=1)
+
+    def handle(self, *args, **options):
+        servers = []
+        sources = options['sources'] or ['tgju']
+        if options['stub']:
+            sources = []
+            for i in range(options['stub']):
+                price, delay, status = options['price'] + i * 1000, 0, 200
+                if i < options['slow']:
+                    delay = options['deadline'] + 1
+                elif i < options['slow'] + options['failing']:
+                    status = 503
+                elif i < options['slow'] + options['failing'] + options['outliers']:
+                    price = int(options['price'] * 1.2)
+                server = StubPriceServer(price, delay=delay, status=status).start()
+                servers.append(server)
+                name = f'stub-{i}'
+                register_provider(name, partial(TGJUGoldProvider, url=server.url, name=name))
+                sources.append(name)
+
+        try:
+            started = time.monotonic()
+            results = fetch_prices(sources, deadline=options['deadline'])
+            elapsed = time.monotonic() - started
+        finally:
+            for server in servers:
+                server.stop()
+
+        for name in sources:
+            if name in results:
+                price, timestamp = results[name]
+                self.stdout.write(f'{name}: {price} at {timestamp}')
+            else:
+                self.stdout.write(self.style.WARNING(f'{name}: no price'))
+        self.stdout.write(f'Fetched {len(results)}/{len(sources)} sources in {elapsed:.2f}s')
+
+        try:
+            aggregated = aggregate_prices(results, quorum=options['quorum'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Aggregated price: {aggregated.price} from {', '.join(aggregated.providers)}"
+            ))
+        except PriceAggregationError as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+
+        health = ProviderHealth()
+        breaker = CircuitBreaker()
+        states = breaker.get_all(sources)
+        now_ms = int(time.time() * 1000)
+        for name, stats in health.get_all(sources).items():
+            self.stdout.write(
+                f"{name}: latency {stats['latency_ms']:.0f}ms, error rate {stats['error_rate']:.2f}, "
+                f"{stats['attempts']} attempts, score {health.score(stats):.0f}, "
+                f"circuit {breaker.status(states[name], now_ms)}"
+            )
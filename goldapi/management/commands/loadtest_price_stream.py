@@ -0,0 +1,153 @@
+import json
+import time
+import asyncio
+import resource
+import statistics
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from goldapi.stream import LOADTEST_CHANNEL, LOADTEST_PROVIDER
+
+
+class Command(BaseCommand):
+    help = ('Opens many concurrent gold price streams against a running ASGI server and reports delivery. '
+            'The server needs GOLD_PRICE_STREAM_LOADTEST on; synthetic ticks go to the load test channel only')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/product/au/stream')
+        parser.add_argument('--clients', type=int, default=1000, help='Concurrent subscribers to open')
+        parser.add_argument('--connect-rate', type=int, default=500, help='New connections per second')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to hold the connections')
+        parser.add_argument('--publish-interval', type=float, default=1,
+                            help='Seconds between synthetic ticks published to Redis, 0 to only listen')
+
+    def handle(self, *args, **options):
+        # Every subscriber is a socket
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+        self.connected = 0
+        self.peak_connected = 0
+        self.failures = {}
+        self.events = 0
+        self.heartbeats = 0
+        self.latencies = []
+        self.ticks = 0
+        asyncio.run(self.run(options))
+
+        self.stdout.write(f"Peak concurrent subscribers: {self.peak_connected}/{options['clients']}")
+        for reason, count in sorted(self.failures.items()):
+            self.stdout.write(self.style.WARNING(f'{count} failed: {reason}'))
+        self.stdout.write(f'Ticks published: {self.ticks}, events received: {self.events}, heartbeats: {self.heartbeats}')
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+            self.stdout.write(
+                f'Delivery latency: p50 {statistics.median(latencies):.0f}ms, '
+                f'p95 {percentile(0.95):.0f}ms, p99 {percentile(0.99):.0f}ms, max {latencies[-1]:.0f}ms'
+            )
+        if self.ticks and self.peak_connected:
+            delivered = self.events / (self.ticks * self.peak_connected)
+            self.stdout.write(self.style.SUCCESS(f'Delivered {delivered:.1%} of ticks to connected subscribers'))
+
+    async def run(self, options):
+        deadline = time.monotonic() + options['duration']
+        url = urlsplit(options['url'])
+        path = f"{url.path}?provider={LOADTEST_PROVIDER}"
+
+        publisher = None
+        if options['publish_interval']:
+            publisher = asyncio.create_task(self.publish(options, deadline))
+
+        clients = []
+        for i in range(options['clients']):
+            clients.append(asyncio.create_task(self.subscriber(url.hostname, url.port or 80, path, deadline)))
+            if (i + 1) % max(options['connect_rate'] // 10, 1) == 0:
+                await asyncio.sleep(0.1)
+        await asyncio.gather(*clients)
+        if publisher is not None:
+            publisher.cancel()
+
+    async def publish(self, options, deadline):
+        redis_client = get_redis_connection('default')
+        # Give the subscribers time to connect
+        await asyncio.sleep(min(2, options['duration'] / 4))
+        while time.monotonic() < deadline - 1:
+            message = json.dumps({
+                'provider': LOADTEST_PROVIDER,
+                'price': 5_000_000 + self.ticks,
+                'timestamp': int(time.time() * 1000),
+            })
+            # Never the production channel: every web worker would price orders from these
+            await asyncio.to_thread(redis_client.publish, LOADTEST_CHANNEL, message)
+            self.ticks += 1
+            await asyncio.sleep(options['publish_interval'])
+
+    def fail(self, reason):
+        self.failures[reason] = self.failures.get(reason, 0) + 1
+
+    async def subscriber(self, host, port, path, deadline):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            self.fail(type(e).__name__)
+            return
+        connected = False
+        try:
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode()
+            )
+            status_line = await reader.readline()
+            if b' 200 ' not in status_line:
+                self.fail(status_line.decode().strip() or 'no response')
+                return
+            headers = (await reader.readuntil(b'\r\n\r\n')).lower()
+            chunked = b'transfer-encoding: chunked' in headers
+
+            connected = True
+            self.connected += 1
+            self.peak_connected = max(self.peak_connected, self.connected)
+            buffer = b''
+            first_event = True
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if chunked:
+                    size = int((await asyncio.wait_for(reader.readline(), remaining)).strip(), 16)
+                    if not size:
+                        break
+                    data = await reader.readexactly(size + 2)
+                    buffer += data[:-2]
+                else:
+                    data = await asyncio.wait_for(reader.read(4096), remaining)
+                    if not data:
+                        break
+                    buffer += data
+                *messages, buffer = buffer.split(b'\n\n')
+                for message in messages:
+                    if message.startswith(b':'):
+                        self.heartbeats += 1
+                    elif first_event:
+                        # The current price sent on connect, not a published tick
+                        first_event = False
+                    else:
+                        self.record_event(message)
+        except asyncio.TimeoutError:
+            pass
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            self.fail(type(e).__name__)
+        finally:
+            if connected:
+                self.connected -= 1
+            writer.close()
+
+    def record_event(self, message):
+        self.events += 1
+        for line in message.split(b'\n'):
+            if line.startswith(b'data: '):
+                timestamp = json.loads(line[6:])['timestamp']
+                self.latencies.append(time.time() * 1000 - timestamp)
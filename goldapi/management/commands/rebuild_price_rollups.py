@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Min, Max
+
+from goldapi.history import update_rollups, flush_price_history
+from goldapi.models import GoldPriceTick
+
+
+class Command(BaseCommand):
+    help = 'Flushes buffered gold prices and recomputes the 1m/1h/1d price rollups from the stored ticks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', help='Only rebuild this provider')
+        parser.add_argument('--days', type=int, default=30, help='Days of ticks recomputed per transaction')
+
+    def handle(self, *args, **options):
+        written = flush_price_history()
+        self.stdout.write(f'Flushed {written} buffered prices')
+
+        ticks = GoldPriceTick.objects.all()
+        if options['provider']:
+            ticks = ticks.filter(provider=options['provider'])
+        spans = ticks.values('provider').annotate(start=Min('timestamp'), end=Max('timestamp'))
+
+        window = timedelta(days=options['days'])
+        total = 0
+        for span in spans:
+            start = span['start']
+            while start <= span['end']:
+                end = min(start + window, span['end'])
+                with transaction.atomic():
+                    total += update_rollups(span['provider'], start, end)
+                start = end + timedelta(days=1)
+            self.stdout.write(f"Rebuilt rollups of {span['provider']}")
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {total} rollups!'))
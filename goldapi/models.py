@@ -0,0 +1,51 @@
+from django.db import models
+from django.contrib.postgres.indexes import BrinIndex
+
+
+class GoldPriceTick(models.Model):
+    """
+    Every price fetched by update_gold_price, append-only.
+
+    Rows arrive in timestamp order, so a BRIN index keeps range scans cheap
+    at a fraction of the size of a B-tree. There is deliberately no unique
+    (provider, timestamp) B-tree next to it; flush_price_history skips
+    ticks that are already stored instead.
+    """
+    provider = models.CharField(max_length=50)
+    price = models.BigIntegerField()
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            BrinIndex(fields=['timestamp'], name='gold_price_tick_ts_brin'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.timestamp}: {self.price}"
+
+
+class GoldPriceRollup(models.Model):
+    """
+    Open, high, low and close of the ticks in one bucket of a resolution.
+    """
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    provider = models.CharField(max_length=50)
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    open = models.BigIntegerField()
+    high = models.BigIntegerField()
+    low = models.BigIntegerField()
+    close = models.BigIntegerField()
+    samples = models.PositiveIntegerField()
+
+    class Meta:
+        # Also serves range queries: (provider, resolution) equality then a bucket range
+        unique_together = ('provider', 'resolution', 'bucket')
+
+    def __str__(self):
+        return f"{self.provider} {self.resolution} {self.bucket}"
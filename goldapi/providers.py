@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
+from functools import partial
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+import codecs
 import logging 
+import os
+import threading
 import time
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -34,24 +41,141 @@ class PriceProvider(ABC):
         pass
 
 
+# Bytes left unread after the price cell that are still drained so the
+# connection can go back to the pool; larger remainders close it instead
+DRAIN_LIMIT = 64 * 1024
+
+# Elements that never have an end tag
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Get the process-wide requests session, so provider requests reuse
+    keep-alive connections. Created again after a fork.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+class PriceCellParser(HTMLParser):
+    """
+    Incremental parser collecting the text of the first element whose
+    data-col attribute matches; no tree is built and feeding can stop as
+    soon as done is set.
+    """
+    
+    def __init__(self, data_col):
+        super().__init__(convert_charrefs=True)
+        self.data_col = data_col
+        self.depth = 0
+        self.parts = []
+        self.done = False
+    
+    def handle_starttag(self, tag, attrs):
+        if self.done or tag in VOID_ELEMENTS:
+            return
+        if self.depth:
+            self.depth += 1
+        elif ('data-col', self.data_col) in attrs:
+            self.depth = 1
+    
+    def handle_startendtag(self, tag, attrs):
+        pass
+    
+    def handle_endtag(self, tag):
+        if self.depth and tag not in VOID_ELEMENTS:
+            self.depth -= 1
+            if not self.depth:
+                self.done = True
+    
+    def handle_data(self, data):
+        if self.depth:
+            self.parts.append(data)
+    
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+
+def extract_cell_text(chunks, data_col, encoding='utf-8'):
+    """
+    Feed byte chunks to a PriceCellParser until the cell is complete.
+    
+    Returns:
+        str: Text of the cell, or None if it was not found
+    """
+    parser = PriceCellParser(data_col)
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        if parser.done:
+            return parser.text
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return parser.text if parser.done else None
+
+
+def extract_cell_text_soup(html, selector):
+    """
+    Full BeautifulSoup parse, the previous extraction path; kept for benchmarks.
+    """
+    price_element = BeautifulSoup(html, 'html.parser').select_one(selector)
+    if not price_element:
+        return None
+    return price_element.text
+
+
 class TGJUGoldProvider(PriceProvider):
     """
     Gold price provider that fetches data from TGJU.org
     Based on the Kotlin implementation in TGJUGoldPrice.kt
     """
     
-    def __init__(self):
-        self.url = "https://www.tgju.org/profile/geram18"
-        self.selector = '[data-col="info.last_trade.PDrCotVal"]'
+    DEFAULT_URL = "https://www.tgju.org/profile/geram18"
+    DATA_COL = "info.last_trade.PDrCotVal"
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    
+    def __init__(self, url=None, timeout=10, name="tgju"):
+        """
+        Args:
+            url (str, optional): Page to scrape, e.g. a local stub server
+            timeout (float): Request timeout in seconds
+            name (str): Name the provider is registered under
+        """
+        self.url = url or self.DEFAULT_URL
+        self.timeout = timeout
+        self._name = name
+        self.selector = f'[data-col="{self.DATA_COL}"]'
     
     @property
     def name(self):
-        return "tgju"
+        return self._name
     
     def get_price(self):
         """
         Fetch gold price from TGJU website.
         
+        The page is streamed and parsed incrementally, and reading stops
+        once the price cell has been seen.
+        
         Returns:
             tuple: (price_value, timestamp_ms)
         
@@ -59,33 +183,23 @@ class TGJUGoldProvider(PriceProvider):
             Exception: If price fetching fails
         """
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(self.url, headers=headers, timeout=10)
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch gold price. Status code: {response.status_code}")
-                raise Exception(f"Failed to fetch gold price. Status code: {response.status_code}")
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            price_element = soup.select_one(self.selector)
+            with get_http_session().get(self.url, headers=self.HEADERS, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    logger.error(f"Failed to fetch gold price. Status code: {response.status_code}")
+                    raise Exception(f"Failed to fetch gold price. Status code: {response.status_code}")
+                
+                price_text = extract_cell_text(
+                    response.iter_content(chunk_size=8192),
+                    self.DATA_COL,
+                    encoding=response.encoding or 'utf-8',
+                )
+                self._release(response)
             
-            if not price_element:
+            if price_text is None:
                 logger.error("Price element not found in the HTML")
                 raise Exception("Price element not found in the HTML")
             
-            price_text = price_element.text.strip() if price_element.text else ""
-            if not price_text:
-                logger.error("Price text is empty")
-                raise Exception("Price text is empty")
-                
-            # Parse price, removing commas and converting to integer
-            try:
-                price = int(price_text.replace(',', '')) // 10
-            except (ValueError, TypeError) as e:
-                logger.error(f"Failed to parse price text '{price_text}': {str(e)}")
-                raise Exception(f"Failed to parse price text: {str(e)}")
-                
+            price = self.parse_price_text(price_text)
             timestamp = int(time.time() * 1000)
             logger.info(f"Successfully fetched gold price: {price}, timestamp: {timestamp}")
             return price, timestamp
@@ -93,15 +207,76 @@ class TGJUGoldProvider(PriceProvider):
         except Exception as e:
             logger.error(f"Error in TGJUGoldProvider: {str(e)}")
             raise
+    
+    @staticmethod
+    def _release(response):
+        """
+        Drain a small unread remainder so the connection is reused, otherwise
+        close it rather than download the rest of the page.
+        """
+        content_length = response.headers.get('Content-Length')
+        if content_length is not None and response.raw is not None:
+            remaining = int(content_length) - response.raw.tell()
+            if remaining <= DRAIN_LIMIT:
+                for _ in response.iter_content(chunk_size=DRAIN_LIMIT):
+                    pass
+                return
+        response.close()
+    
+    @staticmethod
+    def parse_price_text(price_text):
+        """
+        Parse the cell text, e.g. "52,340,000" rials, into tomans.
+        
+        Raises:
+            Exception: If the text is empty or not a number
+        """
+        price_text = price_text.strip() if price_text else ""
+        if not price_text:
+            logger.error("Price text is empty")
+            raise Exception("Price text is empty")
+            
+        # Parse price, removing commas and converting to integer
+        try:
+            return int(price_text.replace(',', '')) // 10
+        except (ValueError, TypeError) as e:
+            logger.error(f"Failed to parse price text '{price_text}': {str(e)}")
+            raise Exception(f"Failed to parse price text: {str(e)}")
+
+
+# Registered providers by name
+PROVIDERS = {
+    "tgju": TGJUGoldProvider,
+    # Add more providers here as they are implemented
+}
+
+def register_provider(provider_name, factory):
+    """
+    Register a provider factory under a name, e.g. another TGJU-format page:
+    register_provider("mirror", partial(TGJUGoldProvider, url=..., name="mirror"))
+    """
+    PROVIDERS[provider_name] = factory
 
+def register_configured_providers():
+    """
+    Register a TGJU-format provider for every name given a url in
+    GOLD_PRICE_PROVIDER_OPTIONS, so GOLD_PRICE_SOURCES can name other pages
+    without code changes.
+    """
+    for provider_name, options in getattr(settings, 'GOLD_PRICE_PROVIDER_OPTIONS', {}).items():
+        if provider_name not in PROVIDERS and options.get('url'):
+            register_provider(provider_name, partial(TGJUGoldProvider, name=provider_name))
+
+register_configured_providers()
 
 # Factory to get price provider instances
-def get_provider(provider_name="tgju"):
+def get_provider(provider_name="tgju", **options):
     """
     Factory function to get a price provider instance.
     
     Args:
         provider_name (str): Name of the provider
+        **options: Constructor arguments, on top of GOLD_PRICE_PROVIDER_OPTIONS[provider_name]
         
     Returns:
         PriceProvider: Instance of a price provider
@@ -109,12 +284,9 @@ def get_provider(provider_name="tgju"):
     Raises:
         ValueError: If provider_name is not supported
     """
-    providers = {
-        "tgju": TGJUGoldProvider,
-        # Add more providers here as they are implemented
-    }
-    
-    if provider_name not in providers:
-        raise ValueError(f"Provider '{provider_name}' is not supported. Available providers: {', '.join(providers.keys())}")
+    if provider_name not in PROVIDERS:
+        raise ValueError(f"Provider '{provider_name}' is not supported. Available providers: {', '.join(PROVIDERS.keys())}")
     
-    return providers[provider_name]() 
\ No newline at end of file
+    provider_options = dict(getattr(settings, 'GOLD_PRICE_PROVIDER_OPTIONS', {}).get(provider_name, {}))
+    provider_options.update(options)
+    return PROVIDERS[provider_name](**provider_options) 
\ No newline at end of file
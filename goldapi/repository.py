@@ -1,15 +1,64 @@
 import time
+import json
 import logging
-from django.core.cache import caches
 from django.core.exceptions import SuspiciousOperation
 from django.conf import settings
+from django_redis import get_redis_connection
+
+from .providers import PROVIDERS
 
 logger = logging.getLogger(__name__)
 
+# Channel every saved price is published on, see goldapi.subscriber
+PRICE_UPDATES_CHANNEL = getattr(settings, 'GOLD_PRICE_UPDATES_CHANNEL', 'gold-price-updates')
+
+# Seconds a price record is kept in Redis. Much longer than
+# GOLD_PRICE_MAX_AGE, so the last known good price outlives a provider outage
+PRICE_RECORD_TTL = 7 * 24 * 3600 #7 days
+
+# List of records not yet written to the history tables, see goldapi.history
+HISTORY_BUFFER_KEY = 'gold-price-history-buffer'
+
+# Counter bumped whenever a saved price differs from the previous one. Each
+# record carries the epoch it was saved in, so caches of priced responses can
+# key on it and stay valid until the price actually changes
+PRICE_EPOCH_KEY = 'gold-price-epoch'
+
+def record_key(provider_name):
+    return f"{provider_name}-gold-price-record"
+
+def encode_record(price, timestamp, provider_name, epoch=0):
+    """
+    Encode a price record as compact bytes: b"price|timestamp|provider|epoch".
+    """
+    return f"{int(price)}|{int(timestamp)}|{provider_name}|{int(epoch)}".encode()
+
+def decode_record(data):
+    """
+    Decode a record written by encode_record.
+    
+    Records saved before epochs existed decode with epoch 0.
+    
+    Returns:
+        tuple: (price, timestamp_ms, provider_name, epoch)
+        
+    Raises:
+        ValueError: If the record is malformed
+    """
+    if isinstance(data, bytes):
+        data = data.decode()
+    price, timestamp, provider_name = data.split('|', 2)
+    provider_name, _, epoch = provider_name.partition('|')
+    return int(price), int(timestamp), provider_name, int(epoch or 0)
+
 class PriceRepository:
     """
     Repository class for storing and retrieving gold price data.
     Currently uses Redis as the storage backend.
+    
+    Each provider's price, timestamp and name are stored together as one
+    record, through the raw Redis client so they skip the cache serializer
+    and compressor, and are written and read atomically.
     """
     
     def __init__(self, provider_name="tgju", cache_name="default"):
@@ -21,19 +70,20 @@ class PriceRepository:
             cache_name (str): Name of the cache to use
         """
         self.provider_name = provider_name
-        self.redis_client = caches[cache_name]
-        self.price_key = f"{provider_name}-gold-price"
-        self.timestamp_key = f"{provider_name}-gold-price-timestamp"
+        self.cache_name = cache_name
+        self.redis_client = get_redis_connection(cache_name)
+        self.record_key = record_key(provider_name)
         # Get max age from settings or use default (30 minutes)
         self.max_age_ms = getattr(settings, 'GOLD_PRICE_MAX_AGE', 30 * 60 * 1000)
     
-    def save_price(self, price, timestamp):
+    def save_price(self, price, timestamp, epoch=0):
         """
         Save price and timestamp to Redis.
         
         Args:
             price (int): Gold price
             timestamp (int): Timestamp in milliseconds
+            epoch (int): Price epoch the price belongs to, see next_epoch
             
         Returns:
             bool: True if successful, False otherwise
@@ -52,17 +102,51 @@ class PriceRepository:
                 logger.error(f"Invalid timestamp type for {self.provider_name}: {type(timestamp)}")
                 return False
 
-            logger.info('Saving to redis....')
-            # Save to Redis
-            # Here the exception is being thrown. What could be the reason?
-            self.redis_client.set(self.price_key, str(price), 1800) #30 min
-            self.redis_client.set(self.timestamp_key, str(timestamp), 1800) #30 min
-            logger.info('Saved to rediszz')
+            # Single SET, readers never see a price paired with another timestamp.
+            # The record is queued for the history tables in the same transaction.
+            record = encode_record(price, timestamp, self.provider_name, epoch)
+            pipeline = self.redis_client.pipeline(transaction=True)
+            pipeline.set(self.record_key, record, ex=PRICE_RECORD_TTL)
+            pipeline.rpush(HISTORY_BUFFER_KEY, record)
+            pipeline.execute()
             logger.info(f"Updated {self.provider_name} gold price: {price}, timestamp: {timestamp}")
-            return True
         except Exception as e:
             logger.error(f"Error saving {self.provider_name} gold price: {str(e)}")
             return False
+        
+        self.publish_price(price, timestamp, epoch)
+        return True
+    
+    def next_epoch(self):
+        """
+        Start a new price epoch, for a price that differs from the saved one.
+        
+        Returns:
+            int: The new epoch
+        """
+        return self.redis_client.incr(PRICE_EPOCH_KEY)
+    
+    def publish_price(self, price, timestamp, epoch=0):
+        """
+        Publish a saved price so web workers update their cached value
+        without polling Redis.
+        
+        Returns:
+            int: Number of subscribers that received the update, 0 on failure
+        """
+        message = json.dumps({
+            'provider': self.provider_name,
+            'price': int(price),
+            'timestamp': int(timestamp),
+            'epoch': int(epoch),
+        })
+        try:
+            # Raw connection: the message must not go through the cache serializer and compressor
+            return self.redis_client.publish(PRICE_UPDATES_CHANNEL, message)
+        except Exception as e:
+            # Subscribers fall back to polling, the price itself is saved
+            logger.warning(f"Could not publish {self.provider_name} gold price: {str(e)}")
+            return 0
     
     def get_price(self):
         """
@@ -74,25 +158,80 @@ class PriceRepository:
         Raises:
             SuspiciousOperation: If timestamp is missing, invalid, outdated, or price is missing
         """
-        timestamp_str = self.redis_client.get(self.timestamp_key)
+        price, _ = self.get_price_record()
+        return price
+
+    def get_price_record(self):
+        """
+        Get gold price together with the timestamp it was fetched at.
         
-        if timestamp_str is None:
-            raise SuspiciousOperation(f"Timestamp not found in Redis for provider {self.provider_name}.")
+        Returns:
+            tuple: (price, timestamp_ms)
+            
+        Raises:
+            SuspiciousOperation: If timestamp is missing, invalid, outdated, or price is missing
+        """
+        price, timestamp, _ = self._check_record(self.provider_name, self.redis_client.get(self.record_key), self.max_age_ms)
+        return price, timestamp
+    
+    def get_latest_record(self):
+        """
+        Get the last known good price, however old it is.
+        
+        Returns:
+            tuple: (price, timestamp_ms, stale, epoch) where stale is True once
+                   the price is older than GOLD_PRICE_MAX_AGE
+            
+        Raises:
+            SuspiciousOperation: If no valid price was ever saved
+        """
+        price, timestamp, epoch = self._check_record(self.provider_name, self.redis_client.get(self.record_key), None)
+        stale = int(time.time() * 1000) - timestamp > self.max_age_ms
+        return price, timestamp, stale, epoch
+    
+    @staticmethod
+    def _check_record(provider_name, data, max_age_ms):
+        if data is None:
+            raise SuspiciousOperation(f"Gold price not found in Redis for provider {provider_name}.")
         
         try:
-            timestamp = int(timestamp_str)
-        except (ValueError, TypeError):
-            raise SuspiciousOperation(f"Invalid timestamp format for provider {self.provider_name}.")
+            price, timestamp, _, epoch = decode_record(data)
+        except (ValueError, UnicodeDecodeError):
+            raise SuspiciousOperation(f"Invalid gold price record for provider {provider_name}.")
         
         current_time = int(time.time() * 1000)
         age = current_time - timestamp
         
-        if age > self.max_age_ms:
-            raise SuspiciousOperation(f"Gold price data is outdated for provider {self.provider_name}.")
+        if max_age_ms is not None and age > max_age_ms:
+            raise SuspiciousOperation(f"Gold price data is outdated for provider {provider_name}.")
+        
+        return price, timestamp, epoch
+    
+    @classmethod
+    def get_prices(cls, provider_names=None, cache_name="default"):
+        """
+        Get the prices of several providers with a single MGET.
+        
+        Args:
+            provider_names (iterable, optional): Providers to read, defaults to all registered providers
+            cache_name (str): Name of the cache to use
+            
+        Returns:
+            dict: provider name -> (price, timestamp_ms), for providers with a valid, recent price
+        """
+        if provider_names is None:
+            provider_names = PROVIDERS.keys()
+        provider_names = list(provider_names)
+        if not provider_names:
+            return {}
         
-        # Fetch price if timestamp is recent enough
-        price = self.redis_client.get(self.price_key)
-        if price is None:
-            raise SuspiciousOperation(f"Gold price not found in Redis for provider {self.provider_name}.")
+        max_age_ms = getattr(settings, 'GOLD_PRICE_MAX_AGE', 30 * 60 * 1000)
+        records = get_redis_connection(cache_name).mget([record_key(name) for name in provider_names])
         
-        return int(price) 
\ No newline at end of file
+        prices = {}
+        for provider_name, data in zip(provider_names, records):
+            try:
+                prices[provider_name] = cls._check_record(provider_name, data, max_age_ms)[:2]
+            except SuspiciousOperation as e:
+                logger.warning(f"Skipping {provider_name} gold price: {str(e)}")
+        return prices
@@ -0,0 +1,82 @@
+import time
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveSchedule:
+    """
+    When the next price update of a provider is due, kept in Redis.
+
+    Beat ticks update_gold_price often and the task skips ticks until the
+    provider is due. The interval halves (down to MIN_INTERVAL) when the
+    price moved by VOLATILE_CHANGE or more, grows by half (up to
+    MAX_INTERVAL) while it stays within FLAT_CHANGE, and returns to
+    BASE_INTERVAL in between. Failed updates are retried after MIN_INTERVAL;
+    the circuit breaker keeps those retries cheap.
+    """
+    MIN_INTERVAL = getattr(settings, 'GOLD_PRICE_MIN_INTERVAL', 60)
+    BASE_INTERVAL = getattr(settings, 'GOLD_PRICE_BASE_INTERVAL', 180)
+    MAX_INTERVAL = getattr(settings, 'GOLD_PRICE_MAX_INTERVAL', 600)
+    VOLATILE_CHANGE = 0.003
+    FLAT_CHANGE = 0.0005
+
+    def __init__(self, provider_name, cache_name='default'):
+        self.provider_name = provider_name
+        self.cache_name = cache_name
+        self.key = f"{provider_name}-gold-price-schedule"
+
+    def get_state(self):
+        """
+        Returns:
+            dict: interval (s) and next_at (ms, 0 when never scheduled)
+        """
+        try:
+            raw = get_redis_connection(self.cache_name).hgetall(self.key)
+        except Exception as e:
+            logger.warning(f"Could not read gold price schedule of {self.provider_name}: {str(e)}")
+            raw = {}
+        return {
+            'interval': float(raw.get(b'interval', self.BASE_INTERVAL)),
+            'next_at': int(raw.get(b'next_at', 0)),
+        }
+
+    def is_due(self, state=None):
+        if state is None:
+            state = self.get_state()
+        return int(time.time() * 1000) >= state['next_at']
+
+    def next_interval(self, interval, price, previous_price):
+        if not price or not previous_price:
+            return self.BASE_INTERVAL
+        change = abs(price - previous_price) / previous_price
+        if change >= self.VOLATILE_CHANGE:
+            return max(self.MIN_INTERVAL, interval / 2)
+        if change <= self.FLAT_CHANGE:
+            return min(self.MAX_INTERVAL, interval * 1.5)
+        return self.BASE_INTERVAL
+
+    def schedule_next(self, price=None, previous_price=None, failed=False, state=None):
+        """
+        Schedule the next update after this one.
+
+        Returns:
+            float: Seconds until the next update
+        """
+        if state is None:
+            state = self.get_state()
+        if failed:
+            interval, delay = state['interval'], self.MIN_INTERVAL
+        else:
+            interval = delay = self.next_interval(state['interval'], price, previous_price)
+        try:
+            get_redis_connection(self.cache_name).hset(self.key, mapping={
+                'interval': interval,
+                'next_at': int(time.time() * 1000 + delay * 1000),
+            })
+        except Exception as e:
+            logger.warning(f"Could not save gold price schedule of {self.provider_name}: {str(e)}")
+        return delay
@@ -0,0 +1,223 @@
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import parse_qs
+
+from django.conf import settings
+
+from .goldapifun import DEFAULT_PROVIDER, PriceSnapshot, aget_gold_price_snapshot, get_price_cache, \
+    get_provider_names
+from .subscriber import PriceSubscriber, get_price_subscriber
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/product/au/stream'
+# Seconds between comment lines that keep idle connections and proxies alive
+HEARTBEAT_INTERVAL = getattr(settings, 'GOLD_PRICE_STREAM_HEARTBEAT', 15)
+# Connections one process accepts before answering 503
+MAX_CLIENTS = getattr(settings, 'GOLD_PRICE_STREAM_MAX_CLIENTS', 10000)
+# Events buffered per client; a slow client loses the oldest ones, prices
+# are snapshots so only the latest one matters
+CLIENT_QUEUE_SIZE = 4
+# Synthetic ticks of loadtest_price_stream: published for LOADTEST_PROVIDER on
+# their own channel, which only the broadcaster listens to, so the price
+# caches and the shop never see them. Streams of LOADTEST_PROVIDER are only
+# served while GOLD_PRICE_STREAM_LOADTEST is on
+LOADTEST_ENABLED = getattr(settings, 'GOLD_PRICE_STREAM_LOADTEST', False)
+LOADTEST_CHANNEL = getattr(settings, 'GOLD_PRICE_LOADTEST_CHANNEL', 'gold-price-loadtest')
+LOADTEST_PROVIDER = 'loadtest'
+
+HEARTBEAT = b': heartbeat\n\n'
+
+
+def format_event(provider_name, price, timestamp, stale=False):
+    """Server-sent event for one price tick, encoded once and shared by all clients."""
+    data = json.dumps({
+        'provider': provider_name,
+        'price': price,
+        'timestamp': timestamp,
+        'stale': stale,
+    }, separators=(',', ':'))
+    return f"id: {timestamp}\nevent: price\ndata: {data}\n\n".encode()
+
+
+class PriceBroadcaster:
+    """
+    Fans price ticks out to every stream of the process through a small
+    bounded queue per client.
+
+    Ticks come from the process' PriceSubscriber thread, so all streams
+    share its single Redis subscription with the price cache. When push
+    updates are disabled the price cache is polled instead.
+    """
+    POLL_INTERVAL = 2
+
+    def __init__(self):
+        self.clients = {}
+        self.dropped = 0
+        self._loop = None
+
+    @property
+    def client_count(self):
+        return sum(len(queues) for queues in self.clients.values())
+
+    def start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        # Creating a price cache starts the subscriber with the cache listeners
+        get_price_cache()
+        subscriber = get_price_subscriber()
+        if subscriber is None:
+            self._loop.create_task(self._poll())
+        else:
+            subscriber.add_listener(self._on_update)
+        if LOADTEST_ENABLED:
+            loadtest_subscriber = PriceSubscriber(channel=LOADTEST_CHANNEL)
+            loadtest_subscriber.add_listener(self._on_loadtest_update)
+            loadtest_subscriber.start()
+
+    def subscribe(self, provider_name):
+        self.start()
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        self.clients.setdefault(provider_name, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, provider_name, queue):
+        queues = self.clients.get(provider_name)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.clients[provider_name]
+
+    def publish(self, provider_name, event):
+        for queue in self.clients.get(provider_name, ()):
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def _on_update(self, update):
+        """Called on the subscriber thread; hands the tick to the event loop."""
+        event = format_event(update['provider'], update['price'], update['timestamp'])
+        self._loop.call_soon_threadsafe(self.publish, update['provider'], event)
+
+    def _on_loadtest_update(self, update):
+        if update['provider'] == LOADTEST_PROVIDER:
+            self._on_update(update)
+
+    async def _poll(self):
+        last_seen = {}
+        while True:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            for provider_name in list(self.clients.keys() - {LOADTEST_PROVIDER}):
+                snapshot = await aget_gold_price_snapshot(provider_name)
+                if last_seen.setdefault(provider_name, snapshot.id) != snapshot.id:
+                    last_seen[provider_name] = snapshot.id
+                    self.publish(provider_name, format_event(
+                        provider_name, snapshot.price, snapshot.timestamp, snapshot.stale
+                    ))
+
+
+class PriceStreamApp:
+    """
+    ASGI middleware serving live gold price ticks as server-sent events on
+    STREAM_PATH and passing every other request to the wrapped application.
+
+    Query params: provider (defaults to the default provider).
+    """
+
+    @staticmethod
+    def is_served(provider_name):
+        if provider_name == LOADTEST_PROVIDER:
+            return LOADTEST_ENABLED
+        return provider_name in get_provider_names()
+
+    @staticmethod
+    async def current_snapshot(provider_name):
+        if provider_name == LOADTEST_PROVIDER:
+            # No stored price, load tests only count the published ticks
+            return PriceSnapshot(0, int(time.time() * 1000), provider_name, stale=True)
+        return await aget_gold_price_snapshot(provider_name)
+
+    def __init__(self, app, broadcaster=None):
+        self.app = app
+        self.broadcaster = broadcaster or PriceBroadcaster()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+            await self.stream(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def respond(self, send, status, body, headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            await self.respond(send, 405, b'{"error":"Method not allowed"}', [(b'allow', b'GET')])
+            return
+        if self.broadcaster.client_count >= MAX_CLIENTS:
+            await self.respond(send, 503, b'{"error":"Too many subscribers"}', [(b'retry-after', b'5')])
+            return
+
+        params = parse_qs(scope.get('query_string', b'').decode())
+        provider_name = params.get('provider', [DEFAULT_PROVIDER])[0]
+        if not self.is_served(provider_name):
+            # Every subscribed name gets a queue, a poller and a Redis channel
+            await self.respond(send, 400, json.dumps({'error': f"Unknown provider {provider_name}"}).encode())
+            return
+
+        queue = self.broadcaster.subscribe(provider_name)
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            # Start with the current price so clients don't wait for the next tick
+            snapshot = await self.current_snapshot(provider_name)
+            await send({
+                'type': 'http.response.body',
+                'body': format_event(provider_name, snapshot.price, snapshot.timestamp, snapshot.stale),
+                'more_body': True,
+            })
+
+            while not disconnected.done():
+                next_event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {next_event, disconnected}, timeout=HEARTBEAT_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event not in done:
+                    next_event.cancel()
+                    if disconnected in done:
+                        break
+                    body = HEARTBEAT
+                else:
+                    body = next_event.result()
+                # Awaiting send is the backpressure: a slow client stops
+                # draining its queue and loses the oldest ticks, nobody else waits
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        except OSError:
+            pass
+        finally:
+            self.broadcaster.unsubscribe(provider_name, queue)
+            disconnected.cancel()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
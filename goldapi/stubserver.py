@@ -0,0 +1,93 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Same markup the TGJU provider scrapes, prices are in rials there
+STUB_PAGE = (
+    '<html><head><title>geram18</title></head><body>{before}'
+    '<table><tr><td data-col="info.last_trade.PDrCotVal">{price:,}</td></tr></table>'
+    '{after}</body></html>'
+)
+
+FILLER_BLOCK = (
+    '<div class="row"><span class="label">&#1591;&#1604;&#1575;</span>'
+    '<a href="/profile/item" title="item">item</a><br><img src="/x.png" alt=""></div>\n'
+)
+
+
+def filler(size):
+    """Markup of about size bytes, dense in tags like the real page."""
+    return FILLER_BLOCK * (size // len(FILLER_BLOCK))
+
+
+def build_price_page(price, padding_before=0, padding_after=0):
+    """
+    A TGJU-format page quoting price (in tomans), with filler markup before
+    and after the price cell.
+
+    Returns:
+        bytes: The page, UTF-8 encoded
+    """
+    return STUB_PAGE.format(
+        price=price * 10,
+        before=filler(padding_before),
+        after=filler(padding_after),
+    ).encode()
+
+
+class StubPriceServer:
+    """
+    Local HTTP server serving a TGJU-format price page, to stand in for a
+    real source when checking or benchmarking providers.
+    """
+
+    def __init__(self, price, delay=0, status=200, padding_before=0, padding_after=0):
+        """
+        Args:
+            price (int): Price in tomans, served as rials like TGJU
+            delay (float): Seconds to wait before answering
+            status (int): HTTP status to answer with
+            padding_before (int): Bytes of filler markup before the price cell
+            padding_after (int): Bytes of filler markup after the price cell
+        """
+        self.price = price
+        self.delay = delay
+        self.status = status
+        self.body = build_price_page(price, padding_before, padding_after)
+        self._server = None
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if stub.delay:
+                    time.sleep(stub.delay)
+                try:
+                    self.send_response(stub.status)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(stub.body)))
+                    self.end_headers()
+                    self.wfile.write(stub.body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up, e.g. after its deadline
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/profile/geram18"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,140 @@
+import os
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .repository import PRICE_UPDATES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class PriceSubscriber(threading.Thread):
+    """
+    Background thread listening for price updates published by
+    update_gold_price and handing them to its listeners.
+
+    Runs as a daemon and reconnects on its own; while it is disconnected
+    listeners are told so they can fall back to polling.
+    """
+
+    def __init__(self, cache_name='default', channel=PRICE_UPDATES_CHANNEL, reconnect_delay=5):
+        """
+        Initialize the subscriber.
+
+        Args:
+            cache_name (str): Name of the django-redis cache to connect through
+            channel (str): Channel the updates are published on
+            reconnect_delay (float): Seconds to wait before reconnecting after an error
+        """
+        super().__init__(name='gold-price-subscriber', daemon=True)
+        self.cache_name = cache_name
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.connected = threading.Event()
+        self._stopped = threading.Event()
+        self._listeners = []
+        self._disconnect_listeners = []
+
+    def add_listener(self, on_update, on_disconnect=None):
+        """
+        Register callbacks.
+
+        Args:
+            on_update (callable): Called with a dict of provider, price, timestamp and epoch
+            on_disconnect (callable, optional): Called when the subscription is lost
+        """
+        self._listeners.append(on_update)
+        if on_disconnect is not None:
+            self._disconnect_listeners.append(on_disconnect)
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            pubsub = None
+            try:
+                pubsub = get_redis_connection(self.cache_name).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.connected.set()
+                logger.info(f"Subscribed to gold price updates on {self.channel}")
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._dispatch(message['data'])
+            except Exception as e:
+                logger.warning(f"Gold price subscription lost: {str(e)}")
+            finally:
+                self.connected.clear()
+                self._notify_disconnect()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stopped.wait(self.reconnect_delay)
+
+    def _dispatch(self, data):
+        try:
+            update = json.loads(data)
+            update = {
+                'provider': update['provider'],
+                'price': int(update['price']),
+                'timestamp': int(update['timestamp']),
+                'epoch': int(update.get('epoch', 0)),
+            }
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f"Invalid gold price update {data!r}: {str(e)}")
+            return
+        for listener in list(self._listeners):
+            try:
+                listener(update)
+            except Exception as e:
+                logger.error(f"Error handling gold price update: {str(e)}")
+
+    def _notify_disconnect(self):
+        for listener in list(self._disconnect_listeners):
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Error handling gold price subscription loss: {str(e)}")
+
+
+_subscriber = None
+_subscriber_pid = None
+_subscriber_lock = threading.Lock()
+
+
+def get_price_subscriber(on_start=None):
+    """
+    Get the subscriber of this process, starting it on first use.
+
+    A subscriber inherited through fork is not running in the child, so a new
+    one is started per process id.
+
+    Args:
+        on_start (callable, optional): Called with a newly created subscriber
+                                       before it starts, to register listeners
+
+    Returns:
+        PriceSubscriber: The running subscriber, or None when push updates are disabled
+    """
+    global _subscriber, _subscriber_pid
+    if not getattr(settings, 'GOLD_PRICE_PUSH_ENABLED', True):
+        return None
+
+    pid = os.getpid()
+    if _subscriber is not None and _subscriber_pid == pid:
+        return _subscriber
+
+    with _subscriber_lock:
+        if _subscriber is None or _subscriber_pid != pid:
+            subscriber = PriceSubscriber()
+            if on_start is not None:
+                on_start(subscriber)
+            subscriber.start()
+            _subscriber, _subscriber_pid = subscriber, pid
+    return _subscriber
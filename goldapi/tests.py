@@ -0,0 +1,284 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .aggregator import PriceAggregationError, ProviderHealth, aggregate_prices, fetch_prices
+from .breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .cache import PriceCache
+from .goldapifun import _on_price_update, _price_caches
+from .providers import PROVIDERS, TGJUGoldProvider, extract_cell_text, get_provider, register_configured_providers, \
+    register_provider
+from .schedule import AdaptiveSchedule
+from .stubserver import StubPriceServer, build_price_page
+
+
+class MemoryBreaker(CircuitBreaker):
+    """CircuitBreaker keeping its states in memory instead of Redis."""
+
+    def __init__(self):
+        super().__init__()
+        self.states = {}
+
+    def get_all(self, provider_names):
+        return {name: self.states.get(name, self._parse({})) for name in provider_names}
+
+    def _save(self, provider_name, state):
+        self.states[provider_name] = state
+
+
+class MemoryHealth(ProviderHealth):
+    """ProviderHealth recording attempts in memory instead of Redis."""
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = []
+
+    def get_all(self, provider_names):
+        return {name: self._parse({}) for name in provider_names}
+
+    def record(self, provider_name, ok, latency_ms, stats=None):
+        self.attempts.append((provider_name, ok))
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class PriceCacheTests(SimpleTestCase):
+    def test_concurrent_misses_load_once(self):
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'price'
+
+        price_cache = PriceCache(loader, ttl=60)
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            values = list(executor.map(lambda _: price_cache.get(), range(10)))
+        self.assertEqual(values, ['price'] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(price_cache.stats()['refreshes'], 1)
+
+    def test_stale_value_served_while_refreshing(self):
+        loading = threading.Event()
+        release = threading.Event()
+
+        def loader():
+            loading.set()
+            release.wait(5)
+            return 'new'
+
+        price_cache = PriceCache(loader, ttl=0.01, grace=60)
+        price_cache.set('old')
+        time.sleep(0.02)
+        refresher = ThreadPoolExecutor(max_workers=1)
+        refreshed = refresher.submit(price_cache.get)
+        self.assertTrue(loading.wait(5))
+        # The refresh is still running, other callers get the stale value at once
+        self.assertEqual(price_cache.get(), 'old')
+        release.set()
+        self.assertEqual(refreshed.result(5), 'new')
+        refresher.shutdown()
+        stats = price_cache.stats()
+        self.assertEqual((stats['stale_hits'], stats['refreshes']), (2, 1))
+
+    def test_stale_value_served_when_refresh_fails(self):
+        def loader():
+            raise ConnectionError('redis down')
+
+        price_cache = PriceCache(loader, ttl=0.01, grace=60)
+        price_cache.set('old')
+        time.sleep(0.02)
+        self.assertEqual(price_cache.get(), 'old')
+        self.assertEqual(price_cache.stats()['errors'], 1)
+
+    def test_miss_past_grace_waits_for_fresh_value(self):
+        price_cache = PriceCache(lambda: 'new', ttl=0.01, grace=0)
+        price_cache.set('old')
+        time.sleep(0.02)
+        self.assertEqual(price_cache.get(), 'new')
+        self.assertEqual(price_cache.stats()['misses'], 1)
+
+
+class PriceCellParserTests(SimpleTestCase):
+    def test_finds_price_split_across_chunks(self):
+        page = build_price_page(5_234_000, padding_before=4096, padding_after=4096)
+        text = extract_cell_text(chunked(page, 7), TGJUGoldProvider.DATA_COL)
+        self.assertEqual(TGJUGoldProvider.parse_price_text(text), 5_234_000)
+
+    def test_stops_reading_after_the_cell(self):
+        page = build_price_page(5_234_000, padding_after=64 * 1024)
+        chunks = iter(chunked(page, 1024))
+        self.assertEqual(extract_cell_text(chunks, TGJUGoldProvider.DATA_COL), '52,340,000')
+        self.assertTrue(next(chunks, None) is not None)
+
+    def test_collects_text_of_nested_elements(self):
+        page = b'<div data-col="x"><b>1,2</b><br>34<span>5</span></div><div>6</div>'
+        self.assertEqual(extract_cell_text([page], 'x'), '1,2345')
+
+    def test_missing_cell(self):
+        self.assertIsNone(extract_cell_text([b'<html><body><td data-col="other">1</td></body></html>'], 'x'))
+
+    def test_rejects_empty_price(self):
+        with self.assertRaises(Exception):
+            TGJUGoldProvider.parse_price_text('  ')
+
+
+class AggregatePricesTests(SimpleTestCase):
+    def test_median_of_agreeing_prices(self):
+        results = {'a': (100, 1), 'b': (102, 3), 'c': (101, 2)}
+        self.assertEqual(aggregate_prices(results, quorum=3), (101, 3, ['a', 'b', 'c']))
+
+    def test_drops_outliers(self):
+        results = {'a': (100, 1), 'b': (101, 2), 'c': (130, 5)}
+        aggregated = aggregate_prices(results, quorum=2, max_deviation=0.05)
+        self.assertEqual(aggregated.providers, ['a', 'b'])
+        self.assertEqual(aggregated.timestamp, 2)
+
+    def test_too_few_agree(self):
+        results = {'a': (100, 1), 'b': (150, 2)}
+        with self.assertRaises(PriceAggregationError):
+            aggregate_prices(results, quorum=2, max_deviation=0.05)
+
+    def test_no_results(self):
+        with self.assertRaises(PriceAggregationError):
+            aggregate_prices({}, quorum=1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = MemoryBreaker()
+
+    def state(self):
+        return self.breaker.get_all(['p'])['p']
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.record_failure('p', self.state())
+
+    def test_opens_after_threshold(self):
+        self.fail(CircuitBreaker.FAILURE_THRESHOLD - 1)
+        self.assertEqual(CircuitBreaker.status(self.state(), 0), CLOSED)
+        with mock.patch('goldapi.breaker.time.time', return_value=1000):
+            self.fail(1)
+        state = self.state()
+        self.assertEqual(state['open_until'], 1000 * 1000 + CircuitBreaker.BASE_BACKOFF * 1000)
+        self.assertEqual(CircuitBreaker.status(state, 1000 * 1000), OPEN)
+        self.assertFalse(self.breaker.allow('p', state, 1000 * 1000))
+
+    def test_half_open_after_backoff(self):
+        self.fail(CircuitBreaker.FAILURE_THRESHOLD)
+        state = self.state()
+        self.assertEqual(CircuitBreaker.status(state, state['open_until']), HALF_OPEN)
+        with mock.patch('goldapi.breaker.get_redis_connection') as redis:
+            redis.return_value.set.side_effect = [True, None]
+            self.assertTrue(self.breaker.allow('p', state, state['open_until']))
+            # Only one probe at a time
+            self.assertFalse(self.breaker.allow('p', state, state['open_until']))
+
+    def test_failed_probe_doubles_backoff(self):
+        self.fail(CircuitBreaker.FAILURE_THRESHOLD)
+        with mock.patch('goldapi.breaker.time.time', return_value=1000):
+            self.fail(1)
+        state = self.state()
+        self.assertEqual(state['trips'], 2)
+        self.assertEqual(state['open_until'], 1000 * 1000 + CircuitBreaker.BASE_BACKOFF * 2 * 1000)
+
+    def test_backoff_is_capped(self):
+        self.fail(CircuitBreaker.FAILURE_THRESHOLD + 20)
+        with mock.patch('goldapi.breaker.time.time', return_value=1000):
+            self.fail(1)
+        self.assertEqual(self.state()['open_until'], 1000 * 1000 + CircuitBreaker.MAX_BACKOFF * 1000)
+
+    def test_success_closes(self):
+        self.fail(CircuitBreaker.FAILURE_THRESHOLD)
+        self.breaker.record_success('p', self.state())
+        self.assertEqual(self.state(), {'failures': 0, 'trips': 0, 'open_until': 0})
+        self.assertEqual(CircuitBreaker.status(self.state(), 0), CLOSED)
+
+
+class AdaptiveScheduleTests(SimpleTestCase):
+    def setUp(self):
+        self.schedule = AdaptiveSchedule('test')
+
+    def test_volatile_price_halves_interval_down_to_min(self):
+        interval = AdaptiveSchedule.BASE_INTERVAL
+        for _ in range(10):
+            interval = self.schedule.next_interval(interval, 1010, 1000)
+        self.assertEqual(interval, AdaptiveSchedule.MIN_INTERVAL)
+
+    def test_flat_price_grows_interval_up_to_max(self):
+        interval = AdaptiveSchedule.BASE_INTERVAL
+        for _ in range(10):
+            interval = self.schedule.next_interval(interval, 1000, 1000)
+        self.assertEqual(interval, AdaptiveSchedule.MAX_INTERVAL)
+
+    def test_moderate_change_returns_to_base(self):
+        self.assertEqual(self.schedule.next_interval(AdaptiveSchedule.MIN_INTERVAL, 1001, 1000),
+                         AdaptiveSchedule.BASE_INTERVAL)
+
+    def test_no_previous_price(self):
+        self.assertEqual(self.schedule.next_interval(AdaptiveSchedule.MIN_INTERVAL, 1000, None),
+                         AdaptiveSchedule.BASE_INTERVAL)
+
+
+class FetchPricesTests(SimpleTestCase):
+    def setUp(self):
+        self.servers = []
+        self.health = MemoryHealth()
+        self.breaker = MemoryBreaker()
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        for name in ('test-stub', 'test-failing'):
+            PROVIDERS.pop(name, None)
+
+    def stub(self, name, price, **options):
+        server = StubPriceServer(price, **options).start()
+        self.servers.append(server)
+        register_provider(name, partial(TGJUGoldProvider, url=server.url, name=name))
+
+    def test_fetches_from_stub_provider(self):
+        self.stub('test-stub', 5_000_000)
+        results = fetch_prices(['test-stub'], deadline=5, health=self.health, breaker=self.breaker)
+        self.assertEqual(results['test-stub'][0], 5_000_000)
+        self.assertEqual(self.health.attempts, [('test-stub', True)])
+        self.assertEqual(self.breaker.states['test-stub']['failures'], 0)
+
+    def test_failing_provider_is_recorded(self):
+        self.stub('test-stub', 5_000_000)
+        self.stub('test-failing', 5_000_000, status=503)
+        results = fetch_prices(['test-stub', 'test-failing'], deadline=5, health=self.health, breaker=self.breaker)
+        self.assertEqual(list(results), ['test-stub'])
+        self.assertIn(('test-failing', False), self.health.attempts)
+        self.assertEqual(self.breaker.states['test-failing']['failures'], 1)
+
+    def test_open_circuit_is_skipped(self):
+        self.breaker.states['test-stub'] = {'failures': 3, 'trips': 1, 'open_until': 2 ** 62}
+        self.assertEqual(fetch_prices(['test-stub'], deadline=5, health=self.health, breaker=self.breaker), {})
+        self.assertEqual(self.health.attempts, [])
+
+
+class ConfiguredProviderTests(SimpleTestCase):
+    def tearDown(self):
+        PROVIDERS.pop('test-mirror', None)
+
+    @override_settings(GOLD_PRICE_PROVIDER_OPTIONS={'test-mirror': {'url': 'http://127.0.0.1:1/profile/geram18'}})
+    def test_provider_from_settings(self):
+        register_configured_providers()
+        provider = get_provider('test-mirror')
+        self.assertIsInstance(provider, TGJUGoldProvider)
+        self.assertEqual(provider.name, 'test-mirror')
+        self.assertEqual(provider.url, 'http://127.0.0.1:1/profile/geram18')
+
+
+class PriceUpdateTests(SimpleTestCase):
+    def test_unknown_provider_gets_no_cache(self):
+        _on_price_update({'provider': 'test-unknown', 'price': 5_000_000, 'timestamp': 1, 'epoch': 1})
+        self.assertNotIn('test-unknown', _price_caches)
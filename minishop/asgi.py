@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'minishop.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from goldapi.stream import PriceStreamApp
+
+# Live gold price server-sent events, everything else goes to Django
+application = PriceStreamApp(django_application)
@@ -17,11 +17,21 @@ app.autodiscover_tasks()
 
 # Configure the periodic tasks
 app.conf.beat_schedule = {
-    'update-tgju-gold-price-every-3-minutes': {
+    'update-tgju-gold-price': {
         'task': 'goldapi.goldapifun.update_gold_price',
-        'schedule': 180.0,  # Every 3 minutes
+        # Ticks only; the task updates every 1-10 minutes depending on volatility
+        'schedule': 30.0,
         'kwargs': {'provider_name': 'tgju'},
     },
+    'flush-gold-price-history-every-minute': {
+        'task': 'goldapi.goldapifun.flush_gold_price_history',
+        'schedule': 60.0,  # Every minute
+    },
+    'flush-carts-every-10-seconds': {
+        'task': 'produt.tasks.flush_carts',
+        # Only does work with CART_STORE = 'redis'
+        'schedule': 10.0,
+    },
     # Add more scheduled tasks for different providers as needed
     # Example:
     # 'update-other-provider-gold-price-every-5-minutes': {
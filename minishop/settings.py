@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'produt',
@@ -219,6 +220,23 @@ CELERY_TASK_IGNORE_RESULT = True
 # Gold Price API Configuration
 GOLD_PRICE_PROVIDER = os.getenv('GOLD_PRICE_PROVIDER', 'tgju')  # Default provider
 GOLD_PRICE_MAX_AGE = int(os.getenv('GOLD_PRICE_MAX_AGE', 30 * 60 * 1000))  # Maximum age in milliseconds
+# Sources fetched concurrently and combined by median into the provider's price
+GOLD_PRICE_SOURCES = {
+    GOLD_PRICE_PROVIDER: [name for name in os.getenv('GOLD_PRICE_SOURCES', GOLD_PRICE_PROVIDER).split(',') if name],
+}
+# Further TGJU-format pages, as name=url pairs, that GOLD_PRICE_SOURCES can name
+GOLD_PRICE_PROVIDER_OPTIONS = {
+    name: {'url': url}
+    for name, _, url in (entry.partition('=') for entry in os.getenv('GOLD_PRICE_PROVIDER_URLS', '').split(',') if entry)
+}
+# Serve the synthetic stream of loadtest_price_stream, see goldapi.stream
+GOLD_PRICE_STREAM_LOADTEST = os.getenv('GOLD_PRICE_STREAM_LOADTEST', 'false').lower() == 'true'
+GOLD_PRICE_QUORUM = int(os.getenv('GOLD_PRICE_QUORUM', 1))  # Agreeing sources needed to accept a price
+GOLD_PRICE_FETCH_DEADLINE = float(os.getenv('GOLD_PRICE_FETCH_DEADLINE', 8))  # Seconds for all sources together
+
+# Cart storage: 'db' writes carts straight to Postgres, 'redis' keeps them in
+# Redis and writes them behind to Postgres with produt.tasks.flush_carts
+CART_STORE = os.getenv('CART_STORE', 'db')
 
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
 
 
 class ProdutConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'produt'
+
+    def ready(self):
+        from produt import signals  # register signal handlers
+
+        pre_migrate.connect(signals.create_search_extensions, sender=self)
@@ -0,0 +1,123 @@
+import math
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'product-catalog-version'
+BUCKET_STATS_PREFIX = 'product-filter-bucket-stats'
+
+# Seconds priced responses stay cached. Their keys change with the catalog
+# version and the gold price epoch, so this only bounds how far the
+# like/comment/rating counters, updated without a version bump, can lag
+PRICED_CACHE_TIMEOUT = getattr(settings, 'PRODUCT_PRICED_CACHE_TIMEOUT', 60 * 60)
+
+# Price bounds of the product filter are widened to a geometric grid with
+# this ratio before caching
+PRICE_BUCKET_RATIO = getattr(settings, 'PRODUCT_FILTER_PRICE_BUCKET_RATIO', 1.25)
+
+
+def get_catalog_version():
+    """
+    Version of the product catalog, bumped whenever a product or variant is
+    saved or deleted. Cache keys that include it are invalidated all at once.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key is missing (first write or evicted)
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        return cache.incr(CATALOG_VERSION_KEY)
+
+
+def priced_cache_key(prefix, snapshot, params):
+    """
+    Cache key of a response priced from a gold price snapshot. Includes the
+    catalog version and the snapshot's price epoch, so every priced entry is
+    invalidated at once when either changes and stays warm in between.
+    """
+    return f"{prefix}:{get_catalog_version()}:{snapshot.version}:{canonical_query(params)}"
+
+
+def canonical_query(params, ignore=()):
+    """
+    Canonical form of request query parameters: sorted, stripped, and without
+    empty values, so equivalent requests share one cache key.
+    """
+    pairs = []
+    for name in sorted(params.keys()):
+        if name in ignore:
+            continue
+        for value in sorted(params.getlist(name)):
+            value = ' '.join(value.split())
+            if value:
+                pairs.append((name, value))
+    return urlencode(pairs)
+
+
+def price_bucket(min_price, max_price, ratio=PRICE_BUCKET_RATIO):
+    """
+    Snap a price range outwards to the bucket grid, so nearby ranges share
+    one cache entry.
+
+    Returns:
+        tuple: (lower, upper, label) where lower/upper are None for open ends
+               and label names the bucket in cache keys and hit/miss stats
+    """
+    if min_price is None or min_price <= 0:
+        lower, lower_label = None, '*'
+    else:
+        index = math.floor(math.log(min_price, ratio))
+        if ratio ** index > min_price:
+            # log rounded up at an exact grid point
+            index -= 1
+        lower, lower_label = ratio ** index, str(index)
+
+    if max_price is None:
+        upper, upper_label = None, '*'
+    elif max_price <= 0:
+        upper, upper_label = 0, '0'
+    else:
+        index = math.ceil(math.log(max_price, ratio))
+        if ratio ** index < max_price:
+            index += 1
+        upper, upper_label = ratio ** index, str(index)
+
+    return lower, upper, f"{lower_label}~{upper_label}"
+
+
+def record_bucket_lookup(label, hit):
+    key = f"{BUCKET_STATS_PREFIX}:{label}:{'hit' if hit else 'miss'}"
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+
+
+def get_bucket_stats():
+    """
+    Hit/miss counters per price bucket.
+
+    Returns:
+        dict: label -> {'hit': int, 'miss': int}
+    """
+    if not hasattr(cache, 'iter_keys'):
+        # Enumerating keys needs the django-redis backend
+        return {}
+    keys = list(cache.iter_keys(f"{BUCKET_STATS_PREFIX}:*"))
+    stats = {}
+    for key, value in cache.get_many(keys).items():
+        label, outcome = key[len(BUCKET_STATS_PREFIX) + 1:].rsplit(':', 1)
+        stats.setdefault(label, {'hit': 0, 'miss': 0})[outcome] = value
+    return stats
+
+
+def reset_bucket_stats():
+    if hasattr(cache, 'delete_pattern'):
+        cache.delete_pattern(f"{BUCKET_STATS_PREFIX}:*")
@@ -0,0 +1,194 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django_redis import get_redis_connection
+
+from produt.models import Cart, CartItem, Product
+
+logger = logging.getLogger(__name__)
+
+# Where carts are written: 'db' (Cart/CartItem rows) or 'redis' (hot store
+# flushed to the same rows by produt.tasks.flush_carts)
+CART_STORE = getattr(settings, 'CART_STORE', 'db')
+
+# Seconds an untouched cart is kept in Redis. Flushed long before that, so
+# an expired cart is simply loaded from Postgres again
+CART_TTL = getattr(settings, 'CART_STORE_TTL', 7 * 24 * 3600)
+
+# Set of user ids whose Redis cart has changes not yet flushed
+DIRTY_CARTS_KEY = 'cart-dirty'
+CART_FLUSH_BATCH_SIZE = 500
+
+# Hash field present in every cart loaded from Postgres, so an empty cart is
+# not loaded again on every request
+LOADED_FIELD = '~'
+
+
+def cart_key(user_id):
+    return f"cart:{user_id}"
+
+
+def load_cart_lines(cart, quantities):
+    """
+    Attach cart lines for {product_id: quantity} to a cart as cart.lines,
+    the attribute CartSerializer reads, with products, categories and
+    variants loaded in two queries. Products that no longer exist are skipped.
+    """
+    products = Product.objects.filter(pk__in=quantities).select_related('category').prefetch_related('variants')
+    products = {product.pk: product for product in products}
+    cart.lines = [
+        CartItem(cart=cart, product=products[product_id], quantity=quantity)
+        for product_id, quantity in sorted(quantities.items())
+        if product_id in products
+    ]
+    return cart
+
+
+class DatabaseCartStore:
+    """Carts written straight to the Cart and CartItem tables."""
+
+    def get_cart(self, user):
+        cart, _ = Cart.objects.select_related('user').get_or_create(user=user)
+        return cart
+
+    def add_item(self, user, product_id, quantity):
+        cart, _ = Cart.objects.get_or_create(user=user)
+        item, created = CartItem.objects.get_or_create(
+            cart=cart, product_id=product_id, defaults={'quantity': quantity}
+        )
+        if not created:
+            CartItem.objects.filter(pk=item.pk).update(quantity=F('quantity') + quantity)
+
+
+class RedisCartStore:
+    """
+    Carts kept in one Redis hash per user, product id -> quantity, and
+    written behind to the Cart and CartItem tables by flush().
+
+    A cart missing from Redis (cold start, eviction or expiry) is rebuilt
+    from Postgres on first use. Quantities change with HINCRBY, so
+    concurrent adds never lose an update. Changes made since the last flush
+    are lost if Redis loses the hash.
+    """
+
+    def __init__(self, cache_name='default'):
+        self.redis_client = get_redis_connection(cache_name)
+
+    def ensure_loaded(self, user_id):
+        """
+        Copy a user's cart from Postgres into Redis unless it is already there.
+        HSETNX keeps quantities changed by a concurrent request meanwhile.
+        """
+        key = cart_key(user_id)
+        if self.redis_client.exists(key):
+            return
+        quantities = dict(CartItem.objects.filter(cart__user_id=user_id).values_list('product_id', 'quantity'))
+        pipeline = self.redis_client.pipeline(transaction=True)
+        for product_id, quantity in quantities.items():
+            pipeline.hsetnx(key, product_id, quantity)
+        pipeline.hsetnx(key, LOADED_FIELD, 1)
+        pipeline.expire(key, CART_TTL)
+        pipeline.execute()
+
+    def get_quantities(self, user_id):
+        """
+        Returns:
+            dict: product_id -> quantity
+        """
+        self.ensure_loaded(user_id)
+        raw = self.redis_client.hgetall(cart_key(user_id))
+        return {
+            int(field): int(quantity) for field, quantity in raw.items()
+            if field != LOADED_FIELD.encode() and int(quantity) > 0
+        }
+
+    def get_cart(self, user):
+        """
+        Unsaved Cart of the user with its lines attached; id and created_at
+        are only known once the cart was flushed.
+        """
+        return load_cart_lines(Cart(user=user), self.get_quantities(user.pk))
+
+    def add_item(self, user, product_id, quantity):
+        self.ensure_loaded(user.pk)
+        key = cart_key(user.pk)
+        pipeline = self.redis_client.pipeline(transaction=True)
+        pipeline.hincrby(key, product_id, quantity)
+        pipeline.expire(key, CART_TTL)
+        pipeline.sadd(DIRTY_CARTS_KEY, user.pk)
+        new_quantity = pipeline.execute()[0]
+        if new_quantity <= 0:
+            self.redis_client.hdel(key, product_id)
+
+    def flush(self, batch_size=CART_FLUSH_BATCH_SIZE):
+        """
+        Write the carts changed since the last flush to Postgres, one batch
+        of users at a time. Carts changed again while flushing stay dirty and
+        are written by the next flush; a failed batch is marked dirty again.
+
+        Returns:
+            int: Number of carts written
+        """
+        written = 0
+        while True:
+            user_ids = [int(user_id) for user_id in self.redis_client.spop(DIRTY_CARTS_KEY, batch_size) or []]
+            if not user_ids:
+                return written
+            try:
+                self._write(user_ids)
+            except Exception:
+                self.redis_client.sadd(DIRTY_CARTS_KEY, *user_ids)
+                raise
+            written += len(user_ids)
+            if len(user_ids) < batch_size:
+                return written
+
+    def _write(self, user_ids):
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipeline.hgetall(cart_key(user_id))
+        carts = {}
+        for user_id, raw in zip(user_ids, pipeline.execute()):
+            if raw:
+                carts[user_id] = {
+                    int(field): int(quantity) for field, quantity in raw.items()
+                    if field != LOADED_FIELD.encode() and int(quantity) > 0
+                }
+
+        product_ids = {product_id for quantities in carts.values() for product_id in quantities}
+        existing_products = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+        with transaction.atomic():
+            Cart.objects.bulk_create(
+                [Cart(user_id=user_id) for user_id in carts.keys() - set(
+                    Cart.objects.filter(user_id__in=carts).values_list('user_id', flat=True)
+                )]
+            )
+            cart_ids = dict(Cart.objects.filter(user_id__in=carts).values_list('user_id', 'id'))
+            items = [
+                CartItem(cart_id=cart_ids[user_id], product_id=product_id, quantity=quantity)
+                for user_id, quantities in carts.items()
+                for product_id, quantity in quantities.items()
+                if product_id in existing_products
+            ]
+            CartItem.objects.bulk_create(
+                items, update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity']
+            )
+            # Lines removed from the Redis carts
+            kept = Q()
+            for user_id, quantities in carts.items():
+                kept |= Q(cart_id=cart_ids[user_id], product_id__in=list(quantities))
+            CartItem.objects.filter(cart_id__in=cart_ids.values()).exclude(kept).delete()
+
+
+_stores = {}
+
+
+def get_cart_store(name=None):
+    name = name or CART_STORE
+    store = _stores.get(name)
+    if store is None:
+        store = _stores[name] = RedisCartStore() if name == 'redis' else DatabaseCartStore()
+    return store
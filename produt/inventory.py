@@ -0,0 +1,156 @@
+import time
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+from produt.cache import bump_catalog_version
+from produt.models import ProductVariant
+
+logger = logging.getLogger(__name__)
+
+# Seconds a shopper's stock reservation is held without checking out
+RESERVATION_TTL = getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60)
+
+
+class OutOfStock(ValueError):
+    """Not enough stock left, the message is safe to show the customer."""
+
+
+def decrement_stock(wanted, held=None):
+    """
+    Take stock of several variants in one conditional UPDATE:
+
+        UPDATE ... SET stock = stock - n WHERE id IN (...) AND stock >= n + held
+
+    Postgres re-checks the condition on rows changed by a concurrent
+    transaction, so stock never goes below what others hold however many
+    checkouts race for the same variant. Must run inside the transaction of
+    the order, which an OutOfStock rolls back.
+
+    Cached product pages show the stock, but bumping the catalog version on
+    every checkout would empty every priced cache at peak load. It is only
+    bumped, once the order is committed, when a variant sells out; other
+    stock counts in cached pages lag by up to PRICED_CACHE_TIMEOUT.
+
+    Args:
+        wanted (dict): variant id -> quantity to take
+        held (dict, optional): variant id -> quantity reserved by other shoppers
+
+    Raises:
+        OutOfStock: If any variant has not enough stock, nothing is taken then
+    """
+    if not wanted:
+        return
+    held = held or {}
+    taken = Case(
+        *[When(pk=variant_id, then=Value(quantity)) for variant_id, quantity in wanted.items()],
+        output_field=IntegerField(),
+    )
+    needed = Case(
+        *[When(pk=variant_id, then=Value(quantity + held.get(variant_id, 0))) for variant_id, quantity in wanted.items()],
+        output_field=IntegerField(),
+    )
+    updated = ProductVariant.objects.filter(pk__in=wanted, stock__gte=needed).update(stock=F('stock') - taken)
+    if updated != len(wanted):
+        stock = dict(ProductVariant.objects.filter(pk__in=wanted).values_list('pk', 'stock'))
+        short = sorted(
+            variant_id for variant_id, quantity in wanted.items()
+            if stock.get(variant_id, 0) - held.get(variant_id, 0) < quantity
+        )
+        raise OutOfStock(f"Not enough stock left of variants {', '.join(map(str, short or wanted))}.")
+    if ProductVariant.objects.filter(pk__in=wanted, stock__lte=0).exists():
+        # robust: the order stands even if the cache is unreachable
+        transaction.on_commit(bump_catalog_version, robust=True)
+
+
+class StockReservations:
+    """
+    Short-lived stock reservations of shoppers, one Redis hash per variant:
+    user id -> b"quantity|expires_at_ms".
+
+    A reservation keeps stock away from other shoppers' checkouts until the
+    holder checks out, releases it or abandons the checkout and lets it
+    expire after RESERVATION_TTL. Reserving only succeeds while the stock
+    not held by others covers it; the hash is updated in a WATCH/MULTI
+    transaction so two shoppers never both get the last units.
+    """
+    KEY_PREFIX = 'stock-reservations'
+    MAX_RETRIES = 10
+
+    def __init__(self, cache_name='default'):
+        self.redis_client = get_redis_connection(cache_name)
+
+    def key(self, variant_id):
+        return f"{self.KEY_PREFIX}:{variant_id}"
+
+    @staticmethod
+    def _active(raw, now_ms):
+        """
+        Returns:
+            tuple: ({user_id: quantity} of live reservations, [expired fields])
+        """
+        active, expired = {}, []
+        for field, value in raw.items():
+            quantity, expires_at = value.split(b'|')
+            if int(expires_at) > now_ms:
+                active[int(field)] = int(quantity)
+            else:
+                expired.append(field)
+        return active, expired
+
+    def held(self, variant_ids, exclude_user=None):
+        """
+        Returns:
+            dict: variant id -> quantity held by live reservations, other than exclude_user's
+        """
+        variant_ids = list(variant_ids)
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for variant_id in variant_ids:
+            pipeline.hgetall(self.key(variant_id))
+        now_ms = int(time.time() * 1000)
+        held = {}
+        for variant_id, raw in zip(variant_ids, pipeline.execute()):
+            active, _ = self._active(raw, now_ms)
+            active.pop(exclude_user, None)
+            held[variant_id] = sum(active.values())
+        return held
+
+    def reserve(self, variant_id, user_id, quantity, ttl=RESERVATION_TTL):
+        """
+        Hold quantity units of a variant for a user, replacing the user's
+        previous reservation of it.
+
+        Raises:
+            OutOfStock: If the stock not held by others does not cover quantity
+        """
+        key = self.key(variant_id)
+        for _ in range(self.MAX_RETRIES):
+            with self.redis_client.pipeline(transaction=True) as pipeline:
+                try:
+                    pipeline.watch(key)
+                    now_ms = int(time.time() * 1000)
+                    active, expired = self._active(pipeline.hgetall(key), now_ms)
+                    active.pop(user_id, None)
+                    stock = ProductVariant.objects.filter(pk=variant_id).values_list('stock', flat=True).first()
+                    if stock is None or stock - sum(active.values()) < quantity:
+                        raise OutOfStock(f"Not enough stock left of variant {variant_id}.")
+                    pipeline.multi()
+                    if expired:
+                        pipeline.hdel(key, *expired)
+                    pipeline.hset(key, user_id, f"{int(quantity)}|{now_ms + ttl * 1000}")
+                    pipeline.expire(key, ttl)
+                    pipeline.execute()
+                    return
+                except WatchError:
+                    continue
+        raise OutOfStock(f"Variant {variant_id} is too busy to reserve, try again.")
+
+    def release(self, user_id, variant_ids):
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for variant_id in variant_ids:
+            pipeline.hdel(self.key(variant_id), user_id)
+        pipeline.execute()
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from goldapi.goldapifun import PriceSnapshot
+from produt.models import ProductVariant
+from produt.orders import OrderPlacementError, place_order
+from produt.pricing import PricingContext
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measures order placement latency and query count for growing numbers of lines, rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 50, 100], help='Lines per order')
+        parser.add_argument('--repeat', type=int, default=5, help='Best of N runs')
+        parser.add_argument('--gold-price', type=int, default=6500000, help='Gold price the lines are priced with')
+
+    def handle(self, *args, **options):
+        customer = get_user_model().objects.first()
+        variants = list(ProductVariant.objects.order_by('-stock')[:max(options['lines'])])
+        if customer is None or len(variants) < max(options['lines']):
+            raise CommandError(f"Needs a user and {max(options['lines'])} variants, see generate_fake_data")
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'best ms':>8}")
+        for count in options['lines']:
+            lines = [
+                {'variant': variant.pk, 'quantity': 1}
+                for variant in variants[:count]
+            ]
+            timings = []
+            for _ in range(options['repeat']):
+                try:
+                    # Nothing is kept: every run is rolled back
+                    with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        pricing = PricingContext(PriceSnapshot(options['gold_price'], int(time.time() * 1000), 'bench'))
+                        try:
+                            place_order(customer, lines, pricing=pricing)
+                        except OrderPlacementError as e:
+                            raise CommandError(f"Could not place an order of {count} lines: {e}")
+                        timings.append(time.perf_counter() - start)
+                        raise Rollback
+                except Rollback:
+                    pass
+            self.stdout.write(f"{count:>6} {len(queries):>8} {min(timings) * 1000:>8.1f}")
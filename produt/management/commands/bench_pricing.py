@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from goldapi.goldapifun import PriceSnapshot
+from produt.models import Product, ProductVariant
+from produt.pricing import PricingContext, price_batch
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks vectorized batch pricing against the per-variant pricing path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of variants to price')
+        parser.add_argument('--gold-price', type=int, default=6500000, help='Gold price used for pricing')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs')
+
+    def build_variants(self, count):
+        # Unsaved instances, so the benchmark measures pricing only and needs no database
+        products = [Product(labor_wage=random.randint(7, 14)) for _ in range(max(count // 3, 1))]
+        return [
+            ProductVariant(
+                product=random.choice(products),
+                weight=round(random.uniform(0.1, 5), 3),
+                discount=random.randint(0, 30) if random.choice([True, False]) else 0,
+            )
+            for _ in range(count)
+        ]
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        snapshot = PriceSnapshot(options['gold_price'], int(time.time() * 1000), 'bench')
+        self.stdout.write(
+            f"{'variants':>10} {'per-object':>12} {'batch':>12} {'speedup':>8} {'arrays only':>12} {'speedup':>8}"
+        )
+
+        for size in options['sizes']:
+            variants = self.build_variants(size)
+
+            def per_object():
+                pricing = PricingContext(snapshot)
+                return [(pricing.compute_raw_price(v), pricing.compute_final_price(v)) for v in variants]
+
+            def batch():
+                pricing = PricingContext(snapshot)
+                pricing.prime(variants)
+                return [pricing.prices(v) for v in variants]
+
+            # Pricing columns that were already loaded as arrays, e.g. with values_list()
+            weights = [v.weight for v in variants]
+            labor_wages = [v.product.labor_wage for v in variants]
+            discounts = [v.discount for v in variants]
+
+            def arrays_only():
+                return price_batch(snapshot.price, weights, labor_wages, discounts)
+
+            if per_object() != batch():
+                raise CommandError(f'Batch prices differ from per-object prices for {size} variants')
+
+            per_object_time = self.best_of(options['repeat'], per_object)
+            batch_time = self.best_of(options['repeat'], batch)
+            arrays_time = self.best_of(options['repeat'], arrays_only)
+            self.stdout.write(
+                f"{size:>10} {per_object_time * 1000:>10.1f}ms {batch_time * 1000:>10.1f}ms "
+                f"{per_object_time / batch_time:>7.1f}x {arrays_time * 1000:>10.1f}ms "
+                f"{per_object_time / arrays_time:>7.1f}x"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Batch prices match the per-object path exactly.'))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from produt.models import Product
+from produt.search import normalize_persian, search_filter, search_rank
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the indexed product search against the name/title icontains path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('terms', nargs='*', default=['طلا', 'گردنبند', 'دست\u200cساز', 'مروارید', 'zzz'],
+                            help='Search terms to benchmark')
+        parser.add_argument('--page-size', type=int, default=15, help='Number of products fetched per query')
+        parser.add_argument('--repeat', type=int, default=20, help='Queries per term and path')
+
+    def timed(self, repeat, queryset, page_size):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # Same work as a paginated request: count plus the first page
+            queryset.count()
+            list(queryset[:page_size].values_list('pk', flat=True))
+        return (time.perf_counter() - start) / repeat
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        self.stdout.write(f'Products in catalog: {products.count()}')
+        self.stdout.write(f"{'term':>12} {'icontains':>12} {'matches':>8} {'indexed':>12} {'matches':>8}")
+
+        for term in options['terms']:
+            icontains = products.filter(
+                Q(name__icontains=term) | Q(title__icontains=term)
+            ).order_by('-product_id')
+            normalized = normalize_persian(term)
+            indexed = products.filter(search_filter(normalized)).annotate(
+                search_rank=search_rank(normalized)
+            ).order_by('-search_rank', '-product_id')
+
+            icontains_time = self.timed(options['repeat'], icontains, options['page_size'])
+            indexed_time = self.timed(options['repeat'], indexed, options['page_size'])
+            self.stdout.write(
+                f"{term:>12} {icontains_time * 1000:>10.2f}ms {icontains.count():>8} "
+                f"{indexed_time * 1000:>10.2f}ms {indexed.count():>8}"
+            )
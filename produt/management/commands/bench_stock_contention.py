@@ -0,0 +1,102 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from goldapi.goldapifun import PriceSnapshot
+from produt.models import Order, ProductVariant
+from produt.orders import OrderPlacementError, place_order
+from produt.pricing import PricingContext
+
+
+class Command(BaseCommand):
+    help = ('Runs many concurrent checkouts against one hot variant and reports oversell and throughput. '
+            'The variant\'s stock is restored and the benchmark orders deleted afterwards')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--variant', type=int, help='Variant to order, defaults to the first one')
+        parser.add_argument('--stock', type=int, default=100, help='Stock the variant starts with')
+        parser.add_argument('--checkouts', type=int, default=500, help='Checkouts to run')
+        parser.add_argument('--concurrency', type=int, default=50, help='Checkouts in flight at once')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per checkout')
+        parser.add_argument('--naive', action='store_true',
+                            help='Read-modify-write the stock instead, to compare against')
+        parser.add_argument('--gold-price', type=int, default=6500000, help='Gold price the checkouts are priced with')
+
+    def handle(self, *args, **options):
+        customer = get_user_model().objects.first()
+        variants = ProductVariant.objects.order_by('pk')
+        variant = (variants.filter(pk=options['variant']) if options['variant'] else variants).first()
+        if customer is None or variant is None:
+            raise CommandError('Needs a user and a variant, see generate_fake_data')
+
+        original_stock = variant.stock
+        ProductVariant.objects.filter(pk=variant.pk).update(stock=options['stock'])
+        lines = [{'variant': variant.pk, 'quantity': options['quantity']}]
+        self.snapshot = PriceSnapshot(options['gold_price'], int(time.time() * 1000), 'bench')
+        checkout = self.naive_checkout if options['naive'] else self.checkout
+        self.placed = []
+        self.rejected = 0
+        self.lock = threading.Lock()
+        # Every worker starts its first checkout at the same time
+        barrier = threading.Barrier(options['concurrency'])
+
+        def worker(count):
+            try:
+                barrier.wait()
+                for _ in range(count):
+                    checkout(customer, variant.pk, lines)
+            finally:
+                connections.close_all()
+
+        counts = [options['checkouts'] // options['concurrency']] * options['concurrency']
+        for i in range(options['checkouts'] % options['concurrency']):
+            counts[i] += 1
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                list(executor.map(worker, counts))
+            elapsed = time.perf_counter() - started
+            final_stock = ProductVariant.objects.get(pk=variant.pk).stock
+        finally:
+            Order.objects.filter(pk__in=self.placed).delete()
+            ProductVariant.objects.filter(pk=variant.pk).update(stock=original_stock)
+
+        sold = len(self.placed) * options['quantity']
+        self.stdout.write(f"{options['checkouts']} checkouts, {options['concurrency']} concurrent, "
+                          f"stock {options['stock']} of variant {variant.pk}")
+        self.stdout.write(f"Placed {len(self.placed)}, rejected {self.rejected}, final stock {final_stock}")
+        self.stdout.write(f"Throughput: {options['checkouts'] / elapsed:.0f} checkouts/s in {elapsed:.2f}s")
+        if sold + final_stock != options['stock'] or final_stock < 0:
+            self.stdout.write(self.style.ERROR(
+                f"Oversold: {sold} units sold, stock went from {options['stock']} to {final_stock}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"No oversell: {sold} sold + {final_stock} left = {options['stock']}"))
+
+    def record(self, order):
+        with self.lock:
+            if order is None:
+                self.rejected += 1
+            else:
+                self.placed.append(order.pk)
+
+    def checkout(self, customer, variant_id, lines):
+        try:
+            self.record(place_order(customer, lines, pricing=PricingContext(self.snapshot)))
+        except OrderPlacementError:
+            self.record(None)
+
+    def naive_checkout(self, customer, variant_id, lines):
+        """What a checkout without conditional decrements does: check, then write."""
+        with transaction.atomic():
+            variant = ProductVariant.objects.get(pk=variant_id)
+            if variant.stock < lines[0]['quantity']:
+                self.record(None)
+                return
+            ProductVariant.objects.filter(pk=variant_id).update(stock=variant.stock - lines[0]['quantity'])
+            self.record(Order.objects.create(customer=customer, total_price=Decimal('1000')))
@@ -35,7 +35,7 @@ class Command(BaseFakeGeneratorCommand):
                     order=order,
                     product=product,
                     quantity=random.randint(1, 2),
-                    price_per_item=round(random.uniform(100, 5000), 3)
+                    price_per_item=random.randint(100, 5000)
                 )
             order.calculate_total_price()
 
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from produt.cache import get_bucket_stats, reset_bucket_stats, PRICE_BUCKET_RATIO
+
+
+class Command(BaseCommand):
+    help = 'Reports hit/miss ratios of the product filter price buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after reporting')
+
+    def handle(self, *args, **options):
+        stats = get_bucket_stats()
+        self.stdout.write(f'Bucket ratio: {PRICE_BUCKET_RATIO}')
+        if not stats:
+            self.stdout.write('No bucket lookups recorded.')
+            return
+
+        self.stdout.write(f"{'bucket':>16} {'hits':>8} {'misses':>8} {'hit ratio':>10}")
+        total_hits = total_misses = 0
+        for label, counters in sorted(stats.items(), key=lambda item: -sum(item[1].values())):
+            hits, misses = counters['hit'], counters['miss']
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(f"{label:>16} {hits:>8} {misses:>8} {hits / (hits + misses):>10.1%}")
+        self.stdout.write(
+            f"{'total':>16} {total_hits:>8} {total_misses:>8} {total_hits / (total_hits + total_misses):>10.1%}"
+        )
+
+        if options['reset']:
+            reset_bucket_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
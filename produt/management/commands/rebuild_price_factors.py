@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from produt.models import ProductVariant
+
+
+class Command(BaseCommand):
+    help = 'Recomputes ProductVariant.price_factor used for database-side price filtering'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of variants updated per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write('Rebuilding variant price factors...')
+
+        batch = []
+        updated = 0
+        for variant in ProductVariant.objects.select_related('product').iterator(chunk_size=batch_size):
+            variant.price_factor = variant.compute_price_factor()
+            batch.append(variant)
+            if len(batch) >= batch_size:
+                ProductVariant.objects.bulk_update(batch, ['price_factor'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            ProductVariant.objects.bulk_update(batch, ['price_factor'])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully updated {updated} variants!'))
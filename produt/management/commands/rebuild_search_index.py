@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from produt.models import Product
+from produt.search import build_search_document, build_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the normalized search document and search vector of every product'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding product search index...')
+
+        updated = 0
+        for product in Product.objects.only('product_id', 'name', 'title', 'tags', 'description').iterator():
+            Product.objects.filter(pk=product.pk).update(
+                search_document=build_search_document(product),
+                search_vector=build_search_vector(product),
+            )
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {updated} products!'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from produt.models import Product, ProductTagCount
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-tag product counts used for tag facets'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Counting product tags...')
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tag, COUNT(DISTINCT product_id) "
+                f"FROM {Product._meta.db_table}, unnest(tags) AS tag GROUP BY tag"
+            )
+            counts = cursor.fetchall()
+
+        with transaction.atomic():
+            ProductTagCount.objects.all().delete()
+            ProductTagCount.objects.bulk_create(
+                [ProductTagCount(tag=tag, product_count=count) for tag, count in counts]
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully counted {len(counts)} tags!'))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Subquery, Count, Sum, IntegerField
+from django.db.models.functions import Coalesce
+from produt.models import Product, ProductVariant, Like, Comment
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized per-product columns from their source tables'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling special sale flags...')
+        special_sale = Exists(ProductVariant.objects.filter(product=OuterRef('pk'), special_sale=True))
+        fixed = Product.objects.exclude(has_special_sale=special_sale).update(has_special_sale=special_sale)
+        self.stdout.write(f'Fixed {fixed} products')
+
+        self.stdout.write('Reconciling like, comment and rating counters...')
+        fixed = self.reconcile_counters()
+        self.stdout.write(f'Fixed {fixed} products')
+
+        self.stdout.write(self.style.SUCCESS('Successfully reconciled product stats!'))
+
+    def aggregate(self, model, expression):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(product=OuterRef('pk')).order_by().values('product')
+                .annotate(value=expression).values('value'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    def reconcile_counters(self):
+        products = Product.objects.annotate(
+            actual_like_count=self.aggregate(Like, Count('id')),
+            actual_comment_count=self.aggregate(Comment, Count('id')),
+            actual_rating_sum=self.aggregate(Comment, Sum('rating')),
+        ).only('product_id', 'like_count', 'comment_count', 'rating_sum', 'rating_count', 'rating_avg')
+
+        drifted = []
+        for product in products.iterator():
+            rating_avg = (product.actual_rating_sum / product.actual_comment_count
+                          if product.actual_comment_count else 0)
+            actual = (product.actual_like_count, product.actual_comment_count, product.actual_rating_sum,
+                      product.actual_comment_count, rating_avg)
+            stored = (product.like_count, product.comment_count, product.rating_sum,
+                      product.rating_count, product.rating_avg)
+            if actual != stored:
+                (product.like_count, product.comment_count, product.rating_sum,
+                 product.rating_count, product.rating_avg) = actual
+                drifted.append(product)
+
+        Product.objects.bulk_update(
+            drifted, ['like_count', 'comment_count', 'rating_sum', 'rating_count', 'rating_avg'], batch_size=1000
+        )
+        return len(drifted)
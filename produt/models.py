@@ -1,8 +1,17 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F, Sum
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+
+from produt.search import build_search_document, build_search_vector
 from django.core.validators import MinValueValidator, MaxValueValidator
 User = get_user_model()
+
+GOLD_TAX_RATE = 0.09
+GOLD_PROFIT_RATE = 0.07
+
 # Create your models here
 def category_image_path(instance, filename):
     return "category/icons/{}/{}".format(instance.name, filename)
@@ -39,9 +48,59 @@ class Product(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     uploaded_at = models.DateTimeField(auto_now=True)
+    # Normalized name, title, tags and description, maintained by save()
+    search_document = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Whether any variant is on special sale, maintained by produt.signals
+    has_special_sale = models.BooleanField(default=False, db_index=True, editable=False)
+    # Like and comment aggregates, maintained by produt.signals
+    like_count = models.IntegerField(default=0, db_index=True, editable=False)
+    comment_count = models.IntegerField(default=0, db_index=True, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, db_index=True, editable=False)
+
+    # Columns maintained with UPDATE queries; saving a stale instance must not overwrite them
+    derived_fields = ('search_vector', 'has_special_sale', 'like_count', 'comment_count',
+                      'rating_sum', 'rating_count', 'rating_avg')
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['search_document'], opclasses=['gin_trgm_ops'], name='product_search_trgm_idx'),
+            GinIndex(fields=['tags'], name='product_tags_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_document = build_search_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_document' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['search_document']
+        elif update_fields is None and not self._state.adding:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.derived_fields
+            ]
+        super().save(*args, **kwargs)
+        Product.objects.filter(pk=self.pk).update(search_vector=build_search_vector(self))
+        # labor_wage is part of every variant's price factor
+        variants = list(self.variants.all())
+        for variant in variants:
+            variant.price_factor = variant.compute_price_factor(product=self)
+        if variants:
+            ProductVariant.objects.bulk_update(variants, ['price_factor'])
+
+class ProductTagCount(models.Model):
+    """Number of products carrying each tag, kept up to date by produt.signals."""
+    tag = models.CharField(max_length=100, primary_key=True)
+    product_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.tag} ({self.product_count})"
+
 class ProductVariant(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variants')
     size = models.IntegerField()
@@ -50,6 +109,8 @@ class ProductVariant(models.Model):
     stock = models.IntegerField(default=0)
     discount = models.IntegerField(default=0)
     special_sale = models.BooleanField(default=False)
+    # Gold-grams equivalent of the final price: final_price ~= price_factor * gold price
+    price_factor = models.FloatField(default=0, db_index=True, editable=False)
     images = ArrayField(
         models.ImageField(upload_to=variant_image_path),
         blank=True,
@@ -63,6 +124,25 @@ class ProductVariant(models.Model):
     def __str__(self):
         return f"{self.product.name} - Size {self.size} - {self.color}"
 
+    def compute_price_factor(self, product=None):
+        """
+        Multiplier that turns the current gold price into this variant's final price
+        (weight x labor wage x tax x profit x discount).
+        """
+        product = product or self.product
+        factor = self.weight * (1 + product.labor_wage / 100)
+        factor *= (1 + GOLD_TAX_RATE) * (1 + GOLD_PROFIT_RATE)
+        if self.discount > 0:
+            factor *= (1 - self.discount / 100)
+        return factor
+
+    def save(self, *args, **kwargs):
+        self.price_factor = self.compute_price_factor()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'price_factor' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['price_factor']
+        super().save(*args, **kwargs)
+
 class Order(models.Model):
     PENDING_STATE = "p"
     COMPLETED_STATE = "c"
@@ -70,21 +150,28 @@ class Order(models.Model):
     status = models.CharField(choices=ORDER_CHOICES, max_length=1, default=PENDING_STATE)
     customer = models.ForeignKey(User, on_delete=models.CASCADE,related_name='orders')
     order_date = models.DateTimeField(auto_now_add=True)
-    total_price = models.DecimalField(max_digits=10, decimal_places=2,default=0.00)
+    # Whole toman, prices are truncated when computed from the gold price
+    total_price = models.DecimalField(max_digits=20, decimal_places=0, default=0)
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer}"
     def calculate_total_price(self):
-        self.total_price = sum(
-            item.quantity * item.price_per_item for item in self.order_items.all()
-        )
-        self.save()
+        total = self.order_items.aggregate(
+            total=Sum(F('quantity') * F('price_per_item'), output_field=models.DecimalField())
+        )['total']
+        self.total_price = total or 0
+        self.save(update_fields=['total_price'])
 
 class OrderItem(models.Model):
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE,related_name='order_items')
+    variant = models.ForeignKey(ProductVariant, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='order_items')
     quantity = models.IntegerField()
-    price_per_item = models.DecimalField(max_digits=10, decimal_places=2)
+    # Computed at checkout from the gold price snapshot below, never recomputed
+    price_per_item = models.DecimalField(max_digits=20, decimal_places=0)
+    gold_price_snapshot = models.CharField(max_length=64, blank=True, default='',
+                                           help_text="Id of the gold price snapshot the item was priced with")
     order = models.ForeignKey(Order, related_name='order_items', on_delete=models.CASCADE)
 
     def __str__(self):
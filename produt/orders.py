@@ -0,0 +1,120 @@
+import logging
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+
+from produt.inventory import OutOfStock, StockReservations, decrement_stock
+from produt.models import Order, OrderItem, ProductVariant
+from produt.pricing import PricingContext
+
+logger = logging.getLogger(__name__)
+
+
+class OrderPlacementError(ValueError):
+    """An order could not be placed; the message is safe to show the customer."""
+
+
+# Largest total Order.total_price can store
+_total_field = Order._meta.get_field('total_price')
+MAX_ORDER_TOTAL = Decimal(10) ** (_total_field.max_digits - _total_field.decimal_places) - 1
+
+
+def place_order(customer, lines, pricing=None, **order_fields):
+    """
+    Place an order in one transaction with a constant number of queries,
+    however many lines it has: load and price the variants in one batch,
+    take their stock with one conditional decrement, insert the order with
+    its total and bulk insert the items.
+
+    Every line is priced server-side from the same gold price snapshot and
+    stores its price and the snapshot id, so orders never need repricing
+    and stay as they were sold when the gold price moves.
+
+    Stock held by other shoppers' reservations is left alone, and the
+    customer's own reservations of the ordered variants are released once
+    the order is committed.
+
+    Args:
+        customer: User placing the order
+        lines (list): dicts with variant (id), quantity and optionally
+                      product (id), which must then be the variant's product
+        pricing (PricingContext, optional): Pricing of the request, a fresh
+                                            snapshot is taken by default
+        **order_fields: Other Order fields, e.g. status
+
+    Returns:
+        Order: The saved order
+
+    Raises:
+        OrderPlacementError: If a variant does not exist, is not of the
+                             given product or is out of stock, no current
+                             gold price is available or the total is too large
+    """
+    if not lines:
+        raise OrderPlacementError("An order needs at least one item.")
+
+    pricing = pricing or PricingContext()
+    snapshot = pricing.snapshot
+    if not snapshot.price or snapshot.stale:
+        raise OrderPlacementError("The gold price is not available right now, please try again later.")
+
+    wanted = Counter()
+    for line in lines:
+        wanted[line['variant']] += line['quantity']
+
+    reservations = StockReservations()
+    try:
+        held = reservations.held(wanted, exclude_user=customer.pk)
+    except Exception as e:
+        # Reservations are advisory, the stock itself is still checked
+        logger.warning(f"Could not read stock reservations: {str(e)}")
+        held = {}
+
+    with transaction.atomic():
+        variants = {
+            variant.pk: variant
+            for variant in ProductVariant.objects.filter(pk__in=wanted).select_related('product').only(
+                'pk', 'weight', 'discount', 'product__labor_wage'
+            )
+        }
+        for line in lines:
+            variant = variants.get(line['variant'])
+            if variant is None:
+                raise OrderPlacementError(f"Variant {line['variant']} not found.")
+            if line.get('product') is not None and variant.product_id != line['product']:
+                raise OrderPlacementError(f"Variant {variant.pk} is not a variant of product {line['product']}.")
+        pricing.prime(variants.values())
+        prices = {variant_id: Decimal(pricing.final_price(variant)) for variant_id, variant in variants.items()}
+
+        try:
+            decrement_stock(wanted, held)
+        except OutOfStock as e:
+            raise OrderPlacementError(str(e))
+
+        # Total in the same pass, so the order is inserted once
+        total_price = sum(line['quantity'] * prices[line['variant']] for line in lines)
+        if total_price > MAX_ORDER_TOTAL:
+            raise OrderPlacementError(f"The order total {total_price} is larger than an order can be.")
+        order = Order.objects.create(customer=customer, total_price=total_price, **order_fields)
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=variants[line['variant']].product_id,
+                variant_id=line['variant'],
+                quantity=line['quantity'],
+                price_per_item=prices[line['variant']],
+                gold_price_snapshot=snapshot.id,
+            )
+            for line in lines
+        ])
+        transaction.on_commit(lambda: release_reservations(reservations, customer.pk, wanted))
+    return order
+
+
+def release_reservations(reservations, user_id, variant_ids):
+    try:
+        reservations.release(user_id, variant_ids)
+    except Exception as e:
+        # They expire on their own
+        logger.warning(f"Could not release stock reservations of user {user_id}: {str(e)}")
@@ -1,19 +1,136 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db import connections
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.response import Response
+import json
 import math
 
-class CustomPagination(PageNumberPagination):
+
+def estimate_count(queryset):
+    """
+    Row count of a queryset as estimated by the PostgreSQL planner, without
+    scanning the matching rows.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination: every page is a range scan on the ordering
+    column, so page 500 costs the same as page 1. The total count is only
+    computed on request, with ?count=exact or a planner estimate with ?count=approx.
+
+    Cursors only seek on the first ordering column, so it should be (nearly)
+    unique; later columns merely order the rows within a page.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-pk'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        self.count = self.get_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'page_size': self.page_size,
+            'results': data
+        })
+
+
+class CursorModeMixin:
+    """
+    Opt-in cursor mode for page number paginators. Requests with
+    ?pagination=cursor, or carrying a cursor token, are paginated with
+    cursor_pagination_class using the view's cursor_ordering.
+    """
+    cursor_pagination_class = KeysetPagination
+    cursor_mode_query_param = 'pagination'
+
+    def use_cursor(self, request):
+        return (request.query_params.get(self.cursor_mode_query_param) == 'cursor'
+                or self.cursor_pagination_class.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            # Page size resolved once, by get_page_size, like in page number mode
+            self.cursor_paginator.page_size = self.get_page_size(request)
+            self.cursor_paginator.page_size_query_param = None
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CustomPagination(CursorModeMixin, PageNumberPagination):
     page_size = 10 
     page_size_query_param = 'page_size'
     max_page_size = 100 
 
     def get_paginated_response(self, data):
-        total_pages = math.ceil(self.page.paginator.count / self.page_size)
+        page_size = self.page.paginator.per_page
+        total_pages = math.ceil(self.page.paginator.count / page_size)
         return Response({
             'count': self.page.paginator.count,
             'total_pages': total_pages,
-            'page_size': self.page_size,
+            'page_size': page_size,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data
-        }) 
\ No newline at end of file
+        }) 
+
+class ProductFilterPagination(CustomPagination):
+    page_size = 15
+    page_size_query_param = 'page_size'
+    max_page_size = 30
+    page_size_choices = (5, 10, 15, 20, 30)
+
+    def get_page_size(self, request):
+        # Snap to a canonical page size so equivalent requests share cache entries
+        page_size = super().get_page_size(request)
+        for choice in self.page_size_choices:
+            if page_size <= choice:
+                return choice
+        return self.max_page_size
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+
+        count = self.page.paginator.count
+        page_size = self.page.paginator.per_page
+        total_pages = (count + page_size - 1) // page_size  # Ceiling division
+        
+        return Response({
+            'count': count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'total_pages': total_pages,
+            'page_size': page_size,
+            'current_page': self.page.number,
+            'results': data
+        })
@@ -0,0 +1,142 @@
+import logging
+
+import numpy as np
+
+from goldapi.goldapifun import get_gold_price_snapshot, PriceSnapshot
+from produt.models import GOLD_TAX_RATE, GOLD_PROFIT_RATE
+
+logger = logging.getLogger(__name__)
+
+GOLD_PRICE_SNAPSHOT_HEADER = 'X-Gold-Price-Snapshot'
+# Set to "true" when prices were computed from a stale or missing gold price
+GOLD_PRICE_STALE_HEADER = 'X-Gold-Price-Stale'
+
+
+def price_batch(gold_price, weights, labor_wages, discounts):
+    """
+    Vectorized pricing of many variants at once.
+
+    Runs the same sequence of float64 operations as the per-variant path, and
+    truncates toward zero like int(), so the results are identical to it.
+
+    Returns:
+        tuple: (raw_prices, final_prices) as int64 arrays
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    labor_wages = np.asarray(labor_wages, dtype=np.float64)
+    discounts = np.asarray(discounts, dtype=np.float64)
+
+    gold_price = float(gold_price) * weights
+    gold_price = gold_price + (gold_price * (labor_wages / 100))
+    gold_price = gold_price + (gold_price * GOLD_TAX_RATE) #tax
+    gold_price = gold_price + (gold_price * GOLD_PROFIT_RATE) #profit
+    raw_prices = np.trunc(gold_price)
+
+    discounted = np.trunc(raw_prices - (raw_prices * (discounts / 100)))
+    final_prices = np.where(discounts > 0, discounted, raw_prices)
+    return raw_prices.astype(np.int64), final_prices.astype(np.int64)
+
+
+class PricingContext:
+    """
+    Request-scoped pricing state: one gold price snapshot used for every price
+    in a response, plus the raw and final price of each variant already priced.
+    """
+
+    def __init__(self, snapshot=None):
+        if snapshot is None:
+            snapshot = self.resolve_snapshot()
+        self.snapshot = snapshot
+        self._prices = {}
+
+    @staticmethod
+    def resolve_snapshot():
+        try:
+            snapshot = get_gold_price_snapshot()
+        except Exception as e:
+            logger.error(f"Error getting gold price snapshot: {str(e)}")
+            return PriceSnapshot(0, 0, None, True)
+        if not snapshot.price:
+            logger.warning("Could not get gold price, using default value")
+        return snapshot
+
+    @property
+    def gold_price(self):
+        return float(self.snapshot.price or 0)
+
+    @staticmethod
+    def _key(variant):
+        return variant.pk if variant.pk is not None else id(variant)
+
+    def prime(self, variants):
+        """
+        Price every not yet priced variant in one vectorized pass.
+        Variants need their product loaded (e.g. through prefetch_related).
+        """
+        prices = self._prices
+        pending = {}
+        for variant in variants:
+            key = variant.pk if variant.pk is not None else id(variant)
+            if key not in prices:
+                pending[key] = variant
+        if not pending:
+            return
+
+        pending_variants = pending.values()
+        raw_prices, final_prices = price_batch(
+            self.gold_price,
+            [variant.weight for variant in pending_variants],
+            [variant.product.labor_wage for variant in pending_variants],
+            [variant.discount for variant in pending_variants],
+        )
+        prices.update(zip(pending, zip(raw_prices.tolist(), final_prices.tolist())))
+
+    def prices(self, variant):
+        """Return (raw_price, final_price) of a variant, pricing it if needed."""
+        prices = self._prices.get(self._key(variant))
+        if prices is None:
+            self.prime([variant])
+            prices = self._prices[self._key(variant)]
+        return prices
+
+    def raw_price(self, variant):
+        return self.prices(variant)[0]
+
+    def final_price(self, variant):
+        return self.prices(variant)[1]
+
+    def cheapest_price(self, variants):
+        """Lowest final price among variants, None when there are none."""
+        return min((self.final_price(variant) for variant in variants), default=None)
+
+    def compute_raw_price(self, variant):
+        """Per-variant reference implementation of the raw price, kept for benchmarks."""
+        gold_price = (self.gold_price * variant.weight)
+        # Get labor_wage from the parent product
+        labor_wage = variant.product.labor_wage
+
+        gold_price = gold_price + (gold_price * (labor_wage / 100))
+        gold_price = gold_price + (gold_price * GOLD_TAX_RATE) #tax
+        gold_price = gold_price + (gold_price * GOLD_PROFIT_RATE) #profit
+
+        return int(gold_price)
+
+    def compute_final_price(self, variant):
+        """Per-variant reference implementation of the final price, kept for benchmarks."""
+        raw_price = self.compute_raw_price(variant)
+        if variant.discount > 0:
+            discount_amount = raw_price * (variant.discount / 100)
+            return int(raw_price - discount_amount)
+        return raw_price
+
+
+def get_pricing_context(context):
+    """
+    Return the PricingContext stored in a serializer context, creating it on
+    first use so nested serializers share the same snapshot.
+    """
+    pricing = context.get('pricing')
+    if pricing is None:
+        pricing = PricingContext()
+        context['pricing'] = pricing
+    return pricing
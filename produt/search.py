@@ -0,0 +1,67 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q, Value
+
+SEARCH_CONFIG = 'simple'  # no stemming, PostgreSQL has no Persian dictionary
+
+_PERSIAN_TRANSLATION = str.maketrans({
+    '\u064a': '\u06cc',  # Arabic yeh -> Persian yeh
+    '\u0649': '\u06cc',  # Alef maksura -> Persian yeh
+    '\u0643': '\u06a9',  # Arabic kaf -> Persian kaf
+    '\u0629': '\u0647',  # Teh marbuta -> heh
+    '\u200c': ' ',  # Zero-width non-joiner
+    '\u200d': None,  # Zero-width joiner
+    '\u0640': None,  # Tatweel
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},  # Persian digits
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+})
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+
+
+def normalize_persian(text):
+    """
+    Normalize text for search: unify Arabic and Persian letters and digits,
+    drop diacritics and zero-width joiners, lowercase and collapse whitespace.
+    """
+    if not text:
+        return ''
+    text = _DIACRITICS.sub('', text.translate(_PERSIAN_TRANSLATION))
+    return ' '.join(text.lower().split())
+
+
+def build_search_document(product):
+    """Normalized text of everything a product can be found by."""
+    parts = [product.name, product.title, ' '.join(product.tags or []), product.description]
+    return normalize_persian(' '.join(part for part in parts if part))
+
+
+def build_search_vector(product):
+    """Weighted search vector: name, title and tags rank above the description."""
+    headline = normalize_persian(' '.join([product.name, product.title, ' '.join(product.tags or [])]))
+    return (
+        SearchVector(Value(headline), config=SEARCH_CONFIG, weight='A')
+        + SearchVector(Value(normalize_persian(product.description)), config=SEARCH_CONFIG, weight='B')
+    )
+
+
+def search_filter(term, prefix=''):
+    """
+    Condition matching products by whole words (search_vector, GIN index) or
+    by substring (search_document, pg_trgm GIN index), for a normalized term.
+
+    Args:
+        term (str): Normalized search term
+        prefix (str): Lookup prefix when filtering a related model, e.g. 'product__'
+    """
+    query = SearchQuery(term, config=SEARCH_CONFIG, search_type='plain')
+    return Q(**{f'{prefix}search_vector': query}) | Q(**{f'{prefix}search_document__contains': term})
+
+
+def search_rank(term, prefix=''):
+    """Relevance of a product for a normalized term, higher is better."""
+    query = SearchQuery(term, config=SEARCH_CONFIG, search_type='plain')
+    return (
+        SearchRank(F(f'{prefix}search_vector'), query)
+        + TrigramSimilarity(f'{prefix}search_document', term)
+    )
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from django.db import models
+from django.db.models import prefetch_related_objects, Prefetch
 
 from produt.models import Category, OrderItem, Order, Baner, CartItem, Cart, Like, Comment, \
     Address, Product, ProductVariant
-from goldapi.goldapifun import get_gold_price
+from produt.orders import OrderPlacementError, place_order
+from produt.pricing import get_pricing_context
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,35 +50,14 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-    def gold_api_price(self):
-        try:
-            response = get_gold_price()
-            if response is None or response == 0:
-                logger.warning("Could not get gold price, using default value")
-                return 0
-            return float(response)
-        except Exception as e:
-            logger.error(f"Error getting gold price in ProductVariantSerializer: {str(e)}")
-            return 0
-            
+    def get_pricing_context(self):
+        return get_pricing_context(self.context)
+
     def get_raw_price(self, obj):
-        price_gold = self.gold_api_price()
-        gold_price = (price_gold * obj.weight)
-        # Get labor_wage from the parent product
-        labor_wage = obj.product.labor_wage
-        
-        gold_price = gold_price + (gold_price * (labor_wage / 100))
-        gold_price = gold_price + (gold_price * 0.09) #tax
-        gold_price = gold_price + (gold_price * 0.07) #profit
-        
-        return int(gold_price)
+        return self.get_pricing_context().raw_price(obj)
 
     def get_final_price(self, obj):
-        raw_price = self.get_raw_price(obj)
-        if obj.discount > 0:
-            discount_amount = raw_price * (obj.discount / 100)
-            return int(raw_price - discount_amount)
-        return raw_price
+        return self.get_pricing_context().final_price(obj)
 
     def get_images(self, obj):
         request = self.context.get('request')
@@ -84,6 +65,16 @@ class ProductVariantSerializer(serializers.ModelSerializer):
             return [request.build_absolute_uri('/media/' + str(image)) for image in obj.images]
         return []
 
+class ProductListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        prefetch_related_objects(products, 'variants')
+        # Price the variants of every product on the page in one batch
+        get_pricing_context(self.context).prime(
+            variant for product in products for variant in product.variants.all()
+        )
+        return super().to_representation(products)
+
 class ProductSerializer(serializers.ModelSerializer):
     tags = serializers.ListField(
         child=serializers.CharField(max_length=100),
@@ -98,7 +89,9 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['product_id', 'name', 'description', 'title',
                  'labor_wage', 'category', 'tags', 'variants', 
+                 'like_count', 'comment_count', 'rating_count', 'rating_avg',
                  'created_at', 'uploaded_at']
+        list_serializer_class = ProductListSerializer
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -110,9 +103,11 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def get_variants(self, obj):
         variants = obj.variants.all()
-        # If special_sale_only is in context, filter variants
+        # Share one gold price snapshot between every variant of every product
+        get_pricing_context(self.context).prime(variants)
+        # If special_sale_only is in context, filter variants without bypassing the prefetch cache
         if self.context.get('special_sale_only'):
-            variants = variants.filter(special_sale=True)
+            variants = [variant for variant in variants if variant.special_sale]
         return ProductVariantSerializer(variants, many=True, context=self.context).data
 
     def get_created_at(self, obj):
@@ -187,11 +182,26 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    """
+    Read only: items are only created by checkout (produt.orders.place_order),
+    which prices them, takes their stock and refuses stale gold prices.
+    """
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'quantity', 'price_per_item', 'order']
+        fields = ['id', 'product', 'variant', 'quantity', 'price_per_item', 'gold_price_snapshot', 'order']
+        read_only_fields = fields
+
+class OrderLineSerializer(serializers.Serializer):
+    """
+    One line of a new order. Variants are plain ids, resolved and priced
+    for all lines at once by produt.orders.place_order.
+    """
+    variant = serializers.IntegerField()
+    product = serializers.IntegerField(required=False, allow_null=True, default=None)
+    quantity = serializers.IntegerField(min_value=1)
+
 class OrderSerializer(serializers.ModelSerializer):
-    order_items_data = OrderItemSerializer(many=True, write_only=True)
+    order_items_data = OrderLineSerializer(many=True, write_only=True, allow_empty=False)
     order_items_detail = OrderItemSerializer(many=True, read_only=True, source='order_items')
     customer = serializers.StringRelatedField(read_only=True)
 
@@ -209,14 +219,13 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         order_items_data = validated_data.pop('order_items_data')
-        validated_data['customer'] = self.context['request'].user
-        order = Order.objects.create(**validated_data)
-        
-        for item_data in order_items_data:
-            OrderItem.objects.create(order=order, **item_data)
-        
-        order.calculate_total_price()
-        return order
+        try:
+            return place_order(
+                self.context['request'].user, order_items_data, pricing=get_pricing_context(self.context),
+                **validated_data
+            )
+        except OrderPlacementError as e:
+            raise serializers.ValidationError({'order_items_data': [str(e)]})
 class BanerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Baner
@@ -224,14 +233,32 @@ class BanerSerializer(serializers.ModelSerializer):
 
 
 class CartItemSerializer(serializers.ModelSerializer):
+    """
+    A cart line. Until a variant is chosen the line is priced at the
+    product's cheapest variant; unit_price is null for products without any.
+    """
     product = ProductSerializer(read_only=True)
+    unit_price = serializers.SerializerMethodField()
+    line_total = serializers.SerializerMethodField()
     
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'quantity']
+        fields = ['id', 'product', 'quantity', 'unit_price', 'line_total']
+
+    def get_unit_price(self, obj):
+        return get_pricing_context(self.context).cheapest_price(obj.product.variants.all())
+
+    def get_line_total(self, obj):
+        unit_price = self.get_unit_price(obj)
+        return unit_price * obj.quantity if unit_price is not None else 0
 
 class CartSerializer(serializers.ModelSerializer):
-    items = CartItemSerializer(many=True, read_only=True)
+    """
+    Cart with priced lines and their total, read in a fixed number of
+    queries (items with their products and categories, then every variant)
+    and priced in one batch from a single gold price snapshot.
+    """
+    items = CartItemSerializer(many=True, read_only=True, source='lines')
     user = serializers.StringRelatedField(read_only=True)
 
     class Meta:
@@ -239,27 +266,39 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'created_at', 'items']
         read_only_fields = ('user',)
 
+    # Lines go to cart.lines, which carts from the Redis store come with
+    ITEMS_PREFETCH = (
+        Prefetch('items', queryset=CartItem.objects.select_related('product__category').order_by('id'), to_attr='lines'),
+        'lines__product__variants',
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if isinstance(self.instance, models.QuerySet):
-            self.instance = self.instance.prefetch_related(
-                'items__product__variants'
-            ).select_related('user')
+            self.instance = self.instance.prefetch_related(*self.ITEMS_PREFETCH).select_related('user')
+
+    def to_representation(self, instance):
+        prefetch_related_objects([instance], *self.ITEMS_PREFETCH)
+        # Price the variants of every cart item in one batch
+        get_pricing_context(self.context).prime(
+            variant for item in instance.lines for variant in item.product.variants.all()
+        )
+        data = super().to_representation(instance)
+        data['total'] = sum(item['line_total'] for item in data['items'])
+        return data
 
 class AddCartItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField(write_only=True)
-    class Meta:
-        model = CartItem
-        fields = ['product_id','quantity']
-    def create(self, validated_data):
-        cart = self.context['cart']
-        product_id = validated_data['product_id']
-        quantity = validated_data['quantity']
-        item, created = CartItem.objects.get_or_create(cart=cart,product=product_id)
-        if not created:
-            item.quantity += quantity
-            item.save()
-        return item
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+    def validate_product_id(self, value):
+        if not Product.objects.filter(pk=value).exists():
+            raise serializers.ValidationError("Product not found.")
+        return value
+
+class StockReservationSerializer(serializers.Serializer):
+    variant = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
 
 class ProductLikeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,119 @@
+from django.db import connections
+from django.db.models import F, Exists, OuterRef, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from produt.cache import bump_catalog_version
+from produt.models import Product, ProductVariant, ProductTagCount, Like, Comment
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductVariant)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def refresh_special_sale_flag(sender, instance, **kwargs):
+    Product.objects.filter(pk=instance.product_id).update(
+        has_special_sale=Exists(
+            ProductVariant.objects.filter(product=OuterRef('pk'), special_sale=True)
+        )
+    )
+
+
+def update_tag_counts(added, removed):
+    if added:
+        ProductTagCount.objects.bulk_create(
+            [ProductTagCount(tag=tag) for tag in added], ignore_conflicts=True
+        )
+        ProductTagCount.objects.filter(tag__in=added).update(product_count=F('product_count') + 1)
+    if removed:
+        ProductTagCount.objects.filter(tag__in=removed, product_count__gt=0).update(
+            product_count=F('product_count') - 1
+        )
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_tags(sender, instance, **kwargs):
+    previous_tags = []
+    if instance.pk is not None:
+        previous_tags = Product.objects.filter(pk=instance.pk).values_list('tags', flat=True).first() or []
+    instance._previous_tags = set(previous_tags)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product_tags(sender, instance, **kwargs):
+    previous_tags = getattr(instance, '_previous_tags', set())
+    current_tags = set(instance.tags or [])
+    update_tag_counts(current_tags - previous_tags, previous_tags - current_tags)
+    instance._previous_tags = current_tags
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product_tags(sender, instance, **kwargs):
+    update_tag_counts(set(), set(instance.tags or []))
+
+
+def update_product_stats(product_id, likes=0, comments=0, rating_sum=0, ratings=0):
+    """Atomically add deltas to a product's like/comment/rating aggregates."""
+    updates = {}
+    if likes:
+        updates['like_count'] = F('like_count') + likes
+    if comments:
+        updates['comment_count'] = F('comment_count') + comments
+    if rating_sum or ratings:
+        # The right-hand side sees the old values, so the average uses the new totals
+        updates['rating_sum'] = F('rating_sum') + rating_sum
+        updates['rating_count'] = F('rating_count') + ratings
+        updates['rating_avg'] = Coalesce(
+            Cast(F('rating_sum') + rating_sum, FloatField()) / NullIf(F('rating_count') + ratings, 0),
+            0.0,
+        )
+    if updates:
+        Product.objects.filter(pk=product_id).update(**updates)
+
+
+@receiver(post_save, sender=Like)
+def count_like(sender, instance, created, **kwargs):
+    if created:
+        update_product_stats(instance.product_id, likes=1)
+
+
+@receiver(post_delete, sender=Like)
+def count_unlike(sender, instance, **kwargs):
+    update_product_stats(instance.product_id, likes=-1)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is not None:
+        instance._previous_rating = Comment.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    previous_rating = getattr(instance, '_previous_rating', None)
+    if created or previous_rating is None:
+        update_product_stats(instance.product_id, comments=1, rating_sum=instance.rating, ratings=1)
+    elif previous_rating != instance.rating:
+        update_product_stats(instance.product_id, rating_sum=instance.rating - previous_rating)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    update_product_stats(instance.product_id, comments=-1, rating_sum=-instance.rating, ratings=-1)
+
+
+def create_search_extensions(using='default', **kwargs):
+    """
+    Enable pg_trgm before produt's tables are migrated; the trigram index on
+    Product.search_document needs it.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
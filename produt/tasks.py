@@ -0,0 +1,29 @@
+import logging
+import traceback
+
+from celery import shared_task
+
+from produt.cartstore import CART_FLUSH_BATCH_SIZE, CART_STORE, get_cart_store
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_carts(batch_size=CART_FLUSH_BATCH_SIZE):
+    """
+    Periodic task to write carts changed in the Redis cart store to Postgres.
+
+    Returns:
+        int: Number of carts written
+    """
+    if CART_STORE != 'redis':
+        return 0
+    try:
+        written = get_cart_store().flush(batch_size=batch_size)
+        if written:
+            logger.info(f"Flushed {written} carts")
+        return written
+    except Exception as e:
+        logger.error(f"Error flushing carts: {str(e)}")
+        logger.debug(traceback.format_exc())
+        return 0
@@ -1,3 +1,197 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.http import QueryDict
+from django.test import SimpleTestCase, override_settings
+from rest_framework import generics
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from goldapi.goldapifun import PriceSnapshot
+from produt.cache import bump_catalog_version, canonical_query, price_bucket
+from produt.inventory import decrement_stock
+from produt.models import Product, ProductVariant
+from produt.pagination import ProductFilterPagination
+from produt.pricing import PricingContext, price_batch
+from produt.search import normalize_persian
+from produt.views import GoldPriceCacheStatsView, ProductFilterListApi
+
+
+class PriceBatchTests(SimpleTestCase):
+    def test_matches_per_variant_prices(self):
+        pricing = PricingContext(PriceSnapshot(6_543_210, 1, 'test'))
+        variants = [
+            ProductVariant(weight=weight, discount=discount, product=Product(labor_wage=labor_wage))
+            for weight in (0.1, 1.37, 2.5, 18.05)
+            for labor_wage in (0, 7.5, 18)
+            for discount in (0, 3, 15, 100)
+        ]
+        raw_prices, final_prices = price_batch(
+            pricing.gold_price,
+            [variant.weight for variant in variants],
+            [variant.product.labor_wage for variant in variants],
+            [variant.discount for variant in variants],
+        )
+        self.assertEqual(raw_prices.tolist(), [pricing.compute_raw_price(variant) for variant in variants])
+        self.assertEqual(final_prices.tolist(), [pricing.compute_final_price(variant) for variant in variants])
+
+    def test_without_gold_price(self):
+        raw_prices, final_prices = price_batch(0, [1.5], [10], [5])
+        self.assertEqual((raw_prices.tolist(), final_prices.tolist()), ([0], [0]))
+
+
+class ProductFilterPriceRangeTests(SimpleTestCase):
+    def setUp(self):
+        self.view = ProductFilterListApi()
+        self.pricing = PricingContext(PriceSnapshot(6_543_217, 1, 'test'))
+        self.variants = []
+        for weight in (0.13, 1.37, 2.5, 7.77, 18.05):
+            for labor_wage in (0, 7.5, 18, 33.3):
+                for discount in (0, 3, 15, 99):
+                    product = Product(labor_wage=labor_wage)
+                    variant = ProductVariant(weight=weight, discount=discount, product=product)
+                    variant.price_factor = variant.compute_price_factor(product)
+                    self.variants.append(variant)
+
+    def matches_sql_range(self, variant, min_price, max_price):
+        lower, upper = self.view.price_factor_range(min_price, max_price, self.pricing.gold_price)
+        return (lower is None or variant.price_factor >= lower) and (upper is None or variant.price_factor <= upper)
+
+    def cut(self, variant, min_price, max_price):
+        products = [{'variants': [{'final_price': self.pricing.final_price(variant)}]}]
+        return ProductFilterListApi.cut_to_price_range(products, min_price, max_price)
+
+    def test_bounds_equal_to_final_price_match(self):
+        for variant in self.variants:
+            final_price = self.pricing.final_price(variant)
+            for min_price, max_price in ((final_price, None), (None, final_price), (final_price, final_price)):
+                self.assertTrue(self.matches_sql_range(variant, min_price, max_price))
+                self.assertEqual(len(self.cut(variant, min_price, max_price)), 1)
+
+    def test_bounds_just_past_final_price_are_cut(self):
+        for variant in self.variants:
+            final_price = self.pricing.final_price(variant)
+            self.assertEqual(self.cut(variant, final_price + 1, None), [])
+            self.assertEqual(self.cut(variant, None, final_price - 1), [])
+
+    def test_cut_keeps_matching_variants_only(self):
+        products = [
+            {'product_id': 1, 'variants': [{'id': 1, 'final_price': 100}, {'id': 2, 'final_price': 300}]},
+            {'product_id': 2, 'variants': [{'id': 3, 'final_price': 500}]},
+        ]
+        self.assertEqual(
+            ProductFilterListApi.cut_to_price_range(products, 50, 200),
+            [{'product_id': 1, 'variants': [{'id': 1, 'final_price': 100}]}],
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProductFilterPriceBucketTests(SimpleTestCase):
+    # Page of the price bucket around 1,000,000 tomans
+    page = {
+        'count': 2,
+        'results': [
+            {'product_id': 2, 'variants': [{'id': 3, 'final_price': 999_999}, {'id': 4, 'final_price': 1_000_000}]},
+            {'product_id': 1, 'variants': [{'id': 1, 'final_price': 1_000_001}]},
+        ],
+    }
+
+    def get(self, query):
+        request = APIRequestFactory().get('/products/', query)
+        with mock.patch.object(generics.ListAPIView, 'list', return_value=Response(self.page)) as listed, \
+                mock.patch.object(PricingContext, 'resolve_snapshot', return_value=PriceSnapshot(6_500_000, 1, 'test')):
+            response = ProductFilterListApi.as_view()(request)
+        return listed.call_count, [
+            (product['product_id'], [variant['id'] for variant in product['variants']])
+            for product in response.data['results']
+        ]
+
+    def test_nearby_bounds_share_one_entry_with_exact_results(self):
+        self.assertEqual(self.get({'min_price': 1_000_000}), (1, [(2, [4]), (1, [1])]))
+        # Served from the first request's entry, cut to its own bounds
+        self.assertEqual(self.get({'min_price': 1_000_001}), (0, [(1, [1])]))
+        self.assertEqual(self.get({'min_price': 999_999, 'max_price': 1_000_000}), (1, [(2, [3, 4])]))
+
+    def test_bucket_covers_bounds(self):
+        for min_price, max_price in ((1, 2), (1_000_000, 1_000_001), (1.5625, 1.5625), (123_456_789, 987_654_321)):
+            lower, upper, _ = price_bucket(min_price, max_price)
+            self.assertLessEqual(lower, min_price)
+            self.assertGreaterEqual(upper, max_price)
+        self.assertEqual(price_bucket(1_000_000, None)[2], price_bucket(1_000_001, None)[2])
+        self.assertEqual(price_bucket(0, None), (None, None, '*~*'))
+
+
+class DecrementStockTests(SimpleTestCase):
+    def decrement(self, sold_out):
+        with mock.patch('produt.inventory.ProductVariant') as variants, \
+                mock.patch('produt.inventory.transaction.on_commit') as on_commit:
+            variants.objects.filter.return_value.update.return_value = 2
+            variants.objects.filter.return_value.exists.return_value = sold_out
+            decrement_stock({1: 2, 2: 1})
+        return on_commit
+
+    def test_sell_out_bumps_catalog_version(self):
+        self.decrement(sold_out=True).assert_called_once_with(bump_catalog_version, robust=True)
+
+    def test_stock_left_keeps_caches(self):
+        self.decrement(sold_out=False).assert_not_called()
+
+
+class CanonicalQueryTests(SimpleTestCase):
+    def test_equivalent_queries_match(self):
+        self.assertEqual(
+            canonical_query(QueryDict('search=gold++ring&category_id=2&min_price=')),
+            canonical_query(QueryDict('category_id=2&search=%20gold%20ring')),
+        )
+
+    def test_repeated_values_are_sorted(self):
+        self.assertEqual(canonical_query(QueryDict('tag=b&tag=a')), 'tag=a&tag=b')
+
+    def test_ignored_params(self):
+        self.assertEqual(canonical_query(QueryDict('cursor=abc&page=2'), ignore=('cursor',)), 'page=2')
+
+
+class NormalizePersianTests(SimpleTestCase):
+    def test_unifies_arabic_letters(self):
+        self.assertEqual(normalize_persian('كيف'), 'کیف')
+
+    def test_digits_and_diacritics(self):
+        self.assertEqual(normalize_persian('طلاً ۱۸'), 'طلا 18')
+
+    def test_joiners_and_whitespace(self):
+        self.assertEqual(normalize_persian('  می‌رودـ  ABC '), 'می رود abc')
+
+    def test_empty(self):
+        self.assertEqual(normalize_persian(None), '')
+
+
+class ProductFilterPaginationTests(SimpleTestCase):
+    def page_size(self, query):
+        request = Request(APIRequestFactory().get(f'/?{query}'))
+        return ProductFilterPagination().get_page_size(request)
+
+    def test_snaps_to_allowed_sizes(self):
+        self.assertEqual(self.page_size('page_size=7'), 10)
+        self.assertEqual(self.page_size('page_size=20'), 20)
+        self.assertEqual(self.page_size('page_size=500'), 30)
+
+    def test_default_size(self):
+        self.assertEqual(self.page_size(''), ProductFilterPagination.page_size)
+
+
+class GoldPriceCacheStatsViewTests(SimpleTestCase):
+    def get(self, user):
+        request = APIRequestFactory().get('/au/cache-stats')
+        force_authenticate(request, user=user)
+        stats = {'tgju': {'hits': 5, 'stale_hits': 1, 'misses': 1, 'refreshes': 2, 'errors': 0}}
+        with mock.patch('produt.views.get_price_cache_stats', return_value=stats):
+            return GoldPriceCacheStatsView.as_view()(request)
+
+    def test_admins_get_the_counters(self):
+        response = self.get(get_user_model()(is_staff=True))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['providers']['tgju']['hits'], 5)
+
+    def test_other_users_are_refused(self):
+        self.assertEqual(self.get(get_user_model()()).status_code, 403)
@@ -2,10 +2,11 @@ from django.urls import path
 
 from produt.models import CartItem
 from produt.views import CategoryListApi, CategoryCreateApi, CategoryDetailView, CategoryDetailApiView, \
-    ProductCreateApi, ProductDetailView, ProductListApi, ProductDetailApiView, OrderItemListCreateView, \
+    ProductCreateApi, ProductDetailView, ProductListApi, ProductDetailApiView, OrderItemListView, \
     OrderItemDetailView, OrderListCreateView, OrderDetailView, SpecialSaleView, BanerviewListApi, BanerCreateApi, \
     BanerDetailView, ProductFilterListApi, CartView, \
-    ProductLikeToggleView, ProductCommentListCreateView, AddressApiView, AddressDetailView, ProductTag, GoldPriceView
+    ProductLikeToggleView, ProductCommentListCreateView, AddressApiView, AddressDetailView, ProductTag, GoldPriceView, \
+    ProductTagCountView, GoldPriceHistoryView, GoldPriceCacheStatsView, StockReservationView
 
 urlpatterns = [
     path('category/list/',CategoryListApi.as_view(), name='category-list'),
@@ -15,7 +16,7 @@ urlpatterns = [
     path('product/create/',ProductCreateApi.as_view(), name='product-create'),
     path('product/detale/',ProductDetailView.as_view(), name='product-detail'),
     path('product_pk/<int:pk>/',ProductDetailApiView.as_view(), name='product-pk'),
-    path('order-items/', OrderItemListCreateView.as_view(), name='orderitem-list-create'),
+    path('order-items/', OrderItemListView.as_view(), name='orderitem-list'),
     path('order-items/<int:pk>/', OrderItemDetailView.as_view(), name='orderitem-detail'),
     path('orders/', OrderListCreateView.as_view(), name='order-list-create'),
     path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
@@ -23,14 +24,17 @@ urlpatterns = [
     path('Baner/list/',BanerviewListApi.as_view(), name='banerview-list'),
     path('Baner/create/',BanerCreateApi.as_view(), name='banerview-list'),
     path('Baner/delete/',BanerDetailView.as_view(), name='banerview-list'),
-    #todo restrict this to round values to be able to cache it
     path('products/',ProductFilterListApi.as_view(), name='filter-product-list'),
     path('cart/', CartView.as_view(), name='cart'),
+    path('cart/reservations/', StockReservationView.as_view(), name='stock-reservations'),
     path('products/<int:pk>/like/', ProductLikeToggleView.as_view(), name='product-like-toggle'),
     path('products/<int:product_id>/comments/', ProductCommentListCreateView.as_view(), name='product-comments'),
     path('addresses/', AddressApiView.as_view(), name='address-list'),
     path('addresses/<int:pk>/', AddressDetailView.as_view(), name='address-detail'),
     path('products/tag/', ProductTag.as_view(), name='product-list-by-tag'),
+    path('products/tag/counts/', ProductTagCountView.as_view(), name='product-tag-counts'),
     path('au', GoldPriceView.as_view(), name='gold-price'),
+    path('au/history', GoldPriceHistoryView.as_view(), name='gold-price-history'),
+    path('au/cache-stats', GoldPriceCacheStatsView.as_view(), name='gold-price-cache-stats'),
 ]
 
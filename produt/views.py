@@ -1,54 +1,114 @@
 from django.core.cache import cache
-from django.db.models import Q, Prefetch
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.views import View
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db.models import Prefetch, Exists, OuterRef
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status, generics, permissions
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 import logging
 
 logger = logging.getLogger(__name__)
 
-from produt.models import Category, OrderItem, Order, Baner, Cart, Like, Comment, Address, Product, ProductVariant
+from produt.models import Category, OrderItem, Order, Baner, Like, Comment, Address, Product, ProductVariant, \
+    ProductTagCount
 from produt.permissions import ModelViewSetsPermission, IsOwnerAuth
+from produt.pagination import ProductFilterPagination
 from produt.serializers import CategorySerializer, ProductSerializer, OrderItemSerializer, OrderSerializer, \
-    BanerSerializer, CartSerializer, CartItemSerializer, CommentSerializer, AddressSerializer, ProductVariantSerializer
+    BanerSerializer, CartSerializer, AddCartItemSerializer, CommentSerializer, AddressSerializer, StockReservationSerializer
+from produt.pricing import PricingContext, GOLD_PRICE_SNAPSHOT_HEADER, GOLD_PRICE_STALE_HEADER
+from produt.cartstore import get_cart_store
+from produt.inventory import OutOfStock, StockReservations, RESERVATION_TTL
+from produt.search import normalize_persian, search_filter, search_rank
+from produt.cache import price_bucket, record_bucket_lookup, priced_cache_key, PRICED_CACHE_TIMEOUT
+from goldapi.goldapifun import DEFAULT_PROVIDER, get_gold_price_snapshot, get_price_cache_stats, get_provider_names
+from goldapi.history import RESOLUTIONS, get_price_history
 
 import base64
 import json
 import hashlib
+import os
 import time
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
+
+class PricingContextMixin:
+    """
+    Resolves one gold price snapshot per request, shares it with the serializers
+    through the 'pricing' context key and reports it in a response header.
+    """
+    def get_pricing_context(self):
+        if getattr(self, '_pricing', None) is None:
+            self._pricing = PricingContext()
+        return self._pricing
 
-class CustomPagination(PageNumberPagination):
-    page_size = 15
-    page_size_query_param = 'page_size'
-    max_page_size = 30
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['pricing'] = self.get_pricing_context()
+        return context
 
-    def get_paginated_response(self, data):
-        count = self.page.paginator.count
-        total_pages = (count + self.page_size - 1) // self.page_size  # Ceiling division
-        
-        return Response({
-            'count': count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'total_pages': total_pages,
-            'page_size': self.page_size,
-            'current_page': self.page.number,
-            'results': data
-        })
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        pricing = getattr(self, '_pricing', None)
+        if pricing is not None:
+            response[GOLD_PRICE_SNAPSHOT_HEADER] = pricing.snapshot.id
+            response[GOLD_PRICE_STALE_HEADER] = 'true' if pricing.snapshot.stale else 'false'
+        return response
+
+class PricedCacheMixin(PricingContextMixin):
+    """
+    Caches whole priced list pages as rendered JSON bytes, keyed on the
+    catalog version and the gold price epoch (see produt.cache.priced_cache_key).
+    """
+    cache_prefix = None
+    CACHE_TIMEOUT = PRICED_CACHE_TIMEOUT
+
+    def get_cache_params(self):
+        return self.request.query_params
 
-class GoldPriceView(APIView):
-    def encode_response(self, price):
+    def get_cache_key(self, params):
+        return priced_cache_key(self.cache_prefix, self.get_pricing_context().snapshot, params)
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_cache_key(self.get_cache_params())
+        content = cache.get(cache_key)
+        self.cache_hit = content is not None
+        if content is not None:
+            return HttpResponse(content, content_type='application/json')
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, JSONRenderer().render(response.data), timeout=self.CACHE_TIMEOUT)
+        return response
+
+class GoldPriceView(View):
+    """
+    Public gold price feed.
+
+    The encoded body only changes with the price and its one second
+    timestamp, so it is built once per price and second and served as
+    cached bytes. The weak ETag only follows the price snapshot, not the
+    timestamp, so polling clients get 304s until the price moves. A plain Django
+    view: it needs no authentication or content negotiation, and skipping
+    DRF's request handling is most of the per-request cost.
+    """
+
+    # (key, body, etag) of the last payload, shared by all requests of the process
+    _payload = None
+
+    def encode_response(self, price, now=None):
+        if now is None:
+            now = time.time()
         data = {
-            "t": int(time.time()),  # timestamp
+            "t": int(now),  # timestamp
             "s": "xau_usd",  # symbol
             "v": float(price),  # value
             "h": hashlib.sha256(str(price).encode()).hexdigest()[:8],  # hash of price
-            "n": datetime.utcnow().isoformat(),  # ISO timestamp
+            "n": datetime.fromtimestamp(now, dt_timezone.utc).replace(tzinfo=None).isoformat(),  # ISO timestamp
             "m": "live_market_data",  # metadata
             "r": 42 
         }
@@ -61,23 +121,120 @@ class GoldPriceView(APIView):
         
         return f"{prefix}.{encoded}.{suffix}"
 
-    def get(self, request):
-        try:
-            from goldapi.goldapifun import get_gold_price
-            price = get_gold_price()
-            encoded_response = self.encode_response(price)
-            return Response({
+    def get_payload(self, snapshot):
+        now = time.time()
+        key = (snapshot.id, snapshot.stale, int(now))
+        payload = GoldPriceView._payload
+        if payload is None or payload[0] != key:
+            encoded_response = self.encode_response(snapshot.price, now)
+            body = json.dumps({
                 "data": encoded_response,
                 "format": "v1.xau.b64.meta",
-                "length": len(encoded_response)
-            })
+                "length": len(encoded_response),
+                "stale": snapshot.stale
+            }, separators=(',', ':')).encode()
+            etag = self.get_etag(snapshot)
+            # Replaced as a whole, concurrent requests at worst build it twice
+            payload = GoldPriceView._payload = (key, body, etag)
+        return payload
+
+    @staticmethod
+    def get_etag(snapshot):
+        digest = hashlib.sha256(f"{snapshot.id}|{snapshot.stale}".encode()).hexdigest()[:16]
+        return f'W/"{digest}"'
+
+    def get(self, request):
+        try:
+            _, body, etag = self.get_payload(get_gold_price_snapshot())
         except Exception as e:
             logger.error(f"Error getting gold price: {str(e)}")
-            return Response(
+            return JsonResponse(
                 {'error': 'Market data temporarily unavailable'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        # Weak comparison, as If-None-Match asks for
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag[2:] in (tag.strip().removeprefix('W/') for tag in if_none_match.split(',')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=1'
+        return response
+
+class GoldPriceHistoryView(APIView):
+    """
+    Gold price history as OHLC rollups.
+
+    Query params: resolution (1m, 1h or 1d, default 1h), from and to (ISO
+    date or datetime, default the last DEFAULT_POINTS buckets) and provider.
+    """
+    DEFAULT_RESOLUTION = '1h'
+    DEFAULT_POINTS = 168
+    MAX_POINTS = 2000
+
+    @staticmethod
+    def parse_moment(value):
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            moment = datetime.combine(day, datetime.min.time())
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, dt_timezone.utc)
+        return moment
+
+    def get(self, request):
+        resolution = request.query_params.get('resolution', self.DEFAULT_RESOLUTION)
+        if resolution not in RESOLUTIONS:
+            return Response(
+                {'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        step = RESOLUTIONS[resolution]
+
+        try:
+            end = self.parse_moment(request.query_params['to']) if 'to' in request.query_params else timezone.now()
+            start = (
+                self.parse_moment(request.query_params['from']) if 'from' in request.query_params
+                else end - step * self.DEFAULT_POINTS
+            )
+        except ValueError:
+            return Response({'error': 'from and to must be ISO dates or datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start >= end:
+            return Response({'error': 'from must be before to'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start) / step > self.MAX_POINTS:
+            return Response(
+                {'error': f'Range too large for {resolution}, at most {self.MAX_POINTS} points, use a coarser resolution'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        provider = request.query_params.get('provider', DEFAULT_PROVIDER)
+        if provider not in get_provider_names():
+            return Response({'error': f"Unknown provider {provider}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'provider': provider,
+            'resolution': resolution,
+            'from': start,
+            'to': end,
+            'results': list(get_price_history(provider, resolution, start, end)),
+        })
+
+
+class GoldPriceCacheStatsView(APIView):
+    """
+    Hit, stale hit, miss, refresh and error counters of the in-process gold
+    price caches, for admins. Every worker process has its own caches, so
+    the counters are those of the process that answers, named by pid.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({'pid': os.getpid(), 'providers': get_price_cache_stats()})
+
 
 # Create your views here.
 
@@ -106,57 +263,89 @@ class CategoryDetailApiView(APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class ProductListApi(generics.ListAPIView):
+class ProductListApi(PricedCacheMixin, generics.ListAPIView):
     queryset = Product.objects.all().prefetch_related('variants')
     serializer_class = ProductSerializer
     permission_classes = (ModelViewSetsPermission,)
+    cache_prefix = 'product_list'
 
-class ProductCreateApi(generics.CreateAPIView):
+class ProductCreateApi(PricingContextMixin, generics.CreateAPIView):
     queryset = Product.objects.prefetch_related('variants')
     serializer_class = ProductSerializer
     permission_classes = (IsOwnerAuth,)
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailView(PricingContextMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.prefetch_related('variants')
     serializer_class = ProductSerializer
     permission_classes = (IsOwnerAuth,)
 
-class ProductDetailApiView(APIView):
+class ProductDetailApiView(PricingContextMixin, APIView):
     def get(self, request, pk):
+        pricing = self.get_pricing_context()
+        cache_key = priced_cache_key(f'product_detail:{pk}', pricing.snapshot, request.query_params)
+        content = cache.get(cache_key)
+        if content is not None:
+            return HttpResponse(content, content_type='application/json')
         try:
             category = Product.objects.prefetch_related('variants').get(product_id=pk)
-            serializer = ProductSerializer(category, context={'request': request})
+            serializer = ProductSerializer(category, context={'request': request, 'pricing': pricing})
+            cache.set(cache_key, JSONRenderer().render(serializer.data), timeout=PRICED_CACHE_TIMEOUT)
             return Response(serializer.data)
         except Product.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
 
-class OrderItemListCreateView(generics.ListCreateAPIView):
-    queryset = OrderItem.objects.all()
+class OrderItemListView(generics.ListAPIView):
+    """
+    Items of the user's own orders. Items are added by placing an order,
+    never on their own.
+    """
     serializer_class = OrderItemSerializer
+    permission_classes = [IsAuthenticated]
 
-class OrderItemDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = OrderItem.objects.all()
+    def get_queryset(self):
+        return OrderItem.objects.filter(order__customer=self.request.user).order_by('-id')
+
+class OrderItemDetailView(generics.RetrieveAPIView):
+    """
+    Order items are read only once placed: changing their variant or
+    quantity would bypass the stock taken at checkout.
+    """
     serializer_class = OrderItemSerializer
     permission_classes = [IsAuthenticated]
 
-class OrderListCreateView(generics.ListCreateAPIView):
+    def get_queryset(self):
+        return OrderItem.objects.filter(order__customer=self.request.user)
+
+class OrderListCreateView(PricingContextMixin, generics.ListCreateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-id'  # same order as order_date
 class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
-class SpecialSaleView(APIView):
-    def get(self, request):
-        # Get products that have at least one variant with special_sale=True
-        products = Product.objects.filter(variants__special_sale=True).distinct().prefetch_related('variants')
-        
-        # Create a custom context that includes special_sale filter
-        context = {'request': request, 'special_sale_only': True}
-        serializer_class = ProductSerializer(products, many=True, context=context)
-        return Response(serializer_class.data)
+class SpecialSaleView(PricedCacheMixin, generics.ListAPIView):
+    """
+    Products with at least one special-sale variant, with only those variants.
+    Served in a constant number of queries from the precomputed
+    Product.has_special_sale flag.
+    """
+    serializer_class = ProductSerializer
+    cursor_ordering = '-product_id'
+    cache_prefix = 'special_sale'
+
+    def get_queryset(self):
+        return Product.objects.filter(has_special_sale=True).select_related('category').prefetch_related(
+            Prefetch('variants', queryset=ProductVariant.objects.filter(special_sale=True).order_by('id'))
+        ).order_by('-product_id')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['special_sale_only'] = True
+        return context
+
 class BanerviewListApi(generics.ListAPIView):
     queryset = Baner.objects.all()
     serializer_class = BanerSerializer
@@ -172,52 +361,115 @@ class BanerDetailView(generics.DestroyAPIView):
     permission_classes = [IsOwnerAuth,]
 
 
-#todo Save product prices to Redis to avoid calculating them everytime
-class ProductFilterListApi(generics.ListAPIView):
+class ProductFilterListApi(PricedCacheMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
-    pagination_class = CustomPagination
+    pagination_class = ProductFilterPagination
     MAX_SEARCH_LENGTH = 32  # Maximum allowed length for search text
-    CACHE_TIMEOUT = 300  # 5 minutes cache timeout
+    # Tomans a final price can lie below price_factor x gold price: the
+    # pricing truncates the raw price, and the discounted price again
+    PRICE_MARGIN = 3
+    cache_prefix = 'product_filter'
+    # Values of ?ordering=, all served by indexed columns
+    ORDERINGS = {
+        'newest': ('-product_id',),
+        'popular': ('-like_count', '-product_id'),
+        'most_commented': ('-comment_count', '-product_id'),
+        'top_rated': ('-rating_avg', '-rating_count', '-product_id'),
+    }
+
+    def get_ordering(self):
+        """Explicit ?ordering=, else relevance when searching, else newest first."""
+        ordering = self.ORDERINGS.get(self.request.query_params.get('ordering'))
+        if ordering is None and self.get_filter_params().get('search'):
+            ordering = ('-search_rank', '-product_id')
+        return ordering or self.ORDERINGS['newest']
+
+    # Cursor pages seek on the first ordering column only, so they are only
+    # served newest first, where that column (product_id) is unique. Counters
+    # and ratings tie a lot; sorting by them needs page numbers
+    cursor_ordering = ORDERINGS['newest']
+
+    def list(self, request, *args, **kwargs):
+        ordering = request.query_params.get('ordering')
+        if ordering not in (None, 'newest') and self.paginator.use_cursor(request):
+            return Response(
+                {'error': f"ordering={ordering} is only paginated with page numbers, cursor pages are newest first"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    def get_cache_key(self, params):
-        """Generate a unique cache key based on all filter parameters"""
-        key_parts = []
-        for param in sorted(params.items()):
-            key_parts.append(f"{param[0]}:{param[1]}")
-        return f"product_filter:{'|'.join(key_parts)}"
+        min_price, max_price = self.get_price_range(self.get_filter_params())
+        response = super().list(request, *args, **kwargs)
+        if (min_price is None and max_price is None) or response.status_code != status.HTTP_200_OK:
+            return response
+
+        # The page is the price bucket's, cut to the requested bounds; count
+        # and page links follow the bucket
+        record_bucket_lookup(price_bucket(min_price, max_price)[2], hit=self.cache_hit)
+        data = response.data if isinstance(response, Response) else json.loads(response.content)
+        return Response({**data, 'results': self.cut_to_price_range(data['results'], min_price, max_price)})
+
+    def get_cache_params(self):
+        """
+        Filter params with the price bounds replaced by their bucket, so
+        nearby bounds share one cached page.
+        """
+        params = self.get_filter_params()
+        min_price, max_price = self.get_price_range(params)
+        if min_price is not None or max_price is not None:
+            params.pop('min_price', None)
+            params.pop('max_price', None)
+            params['price_bucket'] = price_bucket(min_price, max_price)[2]
+        return params
+
+    def get_filter_params(self):
+        """
+        Query parameters in canonical form: normalized search text and the page
+        size snapped to one of the allowed sizes.
+        """
+        params = self.request.query_params.copy()
+        if params.get('search'):
+            params['search'] = self.normalize_search(params['search'])
+        if params.get(self.paginator.page_size_query_param):
+            params[self.paginator.page_size_query_param] = str(self.paginator.get_page_size(self.request))
+        return params
+
+    @staticmethod
+    def normalize_search(search):
+        return normalize_persian(search)
+
+    @staticmethod
+    def get_price_range(params):
+        """
+        Returns:
+            tuple: (min_price, max_price) of the request, None for open or invalid bounds
+        """
+        try:
+            min_price = float(params['min_price']) if params.get('min_price') else None
+            max_price = float(params['max_price']) if params.get('max_price') else None
+        except (ValueError, TypeError):
+            return None, None
+        return min_price, max_price
 
     def get_queryset(self):
-        queryset = Product.objects.all().prefetch_related(
-            Prefetch(
-                'variants',
-                queryset=ProductVariant.objects.all().order_by('id')
-            )
-        ).order_by('-product_id')
-        
+        queryset = Product.objects.all()
+        variants = ProductVariant.objects.all()
+        params = self.get_filter_params()
+
         # Get filter parameters
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        category_id = self.request.query_params.get('category_id')
-        search = self.request.query_params.get('search')
+        min_price, max_price = self.get_price_range(params)
+        category_id = params.get('category_id')
+        search = params.get('search')
 
         # Validate search text length
         if search and len(search) > self.MAX_SEARCH_LENGTH:
             return Product.objects.none()
 
-        # Generate cache key based on all parameters
-        cache_key = self.get_cache_key(self.request.query_params)
-        
-        # Try to get cached results
-        cached_results = cache.get(cache_key)
-        if cached_results is not None:
-            return cached_results
-
         # Apply search filter if search term exists
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(title__icontains=search)
+            queryset = queryset.filter(search_filter(search)).annotate(
+                search_rank=search_rank(search)
             )
+        queryset = queryset.order_by(*self.get_ordering())
 
         # Apply category filter
         if category_id:
@@ -227,63 +479,121 @@ class ProductFilterListApi(generics.ListAPIView):
             except (ValueError, TypeError):
                 pass
 
-        # If no price filters, cache and return the queryset
-        if not min_price and not max_price:
-            cache.set(cache_key, queryset, timeout=self.CACHE_TIMEOUT)
-            return queryset
-
-        # Apply price filtering
+        # Apply average rating filter
         try:
-            min_price = float(min_price) if min_price else None
-            max_price = float(max_price) if max_price else None
+            min_rating = float(params.get('min_rating'))
+            queryset = queryset.filter(rating_avg__gte=min_rating)
         except (ValueError, TypeError):
-            cache.set(cache_key, queryset, timeout=self.CACHE_TIMEOUT)
-            return queryset
+            pass
 
-        # Filter products based on variant prices
-        filtered_products = []
-        variant_serializer = ProductVariantSerializer(context={'request': self.request})
-        
-        for product in queryset:
-            eligible_variants = []
-            for variant in product.variants.all():
-                variant_serializer.instance = variant
-                final_price = variant_serializer.get_final_price(variant)
-                if final_price is not None:
-                    if ((min_price is None or final_price >= min_price) and 
-                        (max_price is None or final_price <= max_price)):
-                        eligible_variants.append(variant)
-            
-            if eligible_variants:
-                product._prefetched_objects_cache = {
-                    'variants': eligible_variants
-                }
-                filtered_products.append(product)
-
-        # Cache the filtered results
-        cache.set(cache_key, filtered_products, timeout=self.CACHE_TIMEOUT)
-        return filtered_products
+        # Apply price filtering
+        if min_price is not None or max_price is not None:
+            # A range on the indexed price_factor column covering the whole
+            # price bucket; the rendered page is cached for the bucket under
+            # the gold price epoch and cut to the exact bounds in list()
+            lower, upper, _ = price_bucket(min_price, max_price)
+            gold_price = self.get_pricing_context().gold_price
+            variants = self.filter_variants_by_price(variants, lower, upper, gold_price)
+            queryset = queryset.filter(Exists(variants.filter(product=OuterRef('pk'))))
+
+        return queryset.prefetch_related(
+            Prefetch('variants', queryset=variants.order_by('id'))
+        )
+
+    def filter_variants_by_price(self, variants, min_price, max_price, gold_price):
+        """
+        Turn a price range into a range on ProductVariant.price_factor using the
+        current gold price, so the database does the filtering.
+        """
+        if gold_price <= 0:
+            # Without a gold price every variant is priced at 0
+            if (min_price is None or min_price <= 0) and (max_price is None or max_price >= 0):
+                return variants
+            return variants.none()
+
+        lower, upper = self.price_factor_range(min_price, max_price, gold_price)
+        if lower is not None:
+            variants = variants.filter(price_factor__gte=lower)
+        if upper is not None:
+            variants = variants.filter(price_factor__lte=upper)
+        return variants
+
+    def price_factor_range(self, min_price, max_price, gold_price):
+        """
+        price_factor range holding every variant whose final price is within
+        [min_price, max_price], widened by PRICE_MARGIN for the truncation.
+        A few variants just outside the bounds match too; cut_to_price_range
+        drops them.
+        """
+        lower = (min_price - self.PRICE_MARGIN) / gold_price if min_price is not None else None
+        upper = (max_price + self.PRICE_MARGIN) / gold_price if max_price is not None else None
+        return lower, upper
+
+    @staticmethod
+    def cut_to_price_range(products, min_price, max_price):
+        """
+        Keep the serialized variants whose final price lies within the bounds,
+        and the products that still have one.
+        """
+        cut = []
+        for product in products:
+            variants = [
+                variant for variant in product['variants']
+                if (min_price is None or variant['final_price'] >= min_price)
+                and (max_price is None or variant['final_price'] <= max_price)
+            ]
+            if variants:
+                cut.append({**product, 'variants': variants})
+        return cut
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
 
-class CartView(APIView):
+class CartView(PricingContextMixin, APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        cart,_ = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
+        cart = get_cart_store().get_cart(request.user)
+        serializer = CartSerializer(cart, context={'pricing': self.get_pricing_context()})
         return Response(serializer.data)
     def post(self, request):
-        cart,_ = Cart.objects.get_or_create(user=request.user)
-        serializer = CartItemSerializer(data=request.data,context={'cart':cart})
+        serializer = AddCartItemSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            get_cart_store().add_item(request.user, serializer.validated_data['product_id'],
+                                      serializer.validated_data['quantity'])
             return Response({"message": "محصول به سبد اضافه شد"}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class StockReservationView(APIView):
+    """
+    Hold stock of a variant while checking out (POST variant, quantity) and
+    give it back when the checkout is abandoned (DELETE variant). Unreleased
+    reservations expire after RESERVATION_TTL; placing the order releases them.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = StockReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            StockReservations().reserve(
+                serializer.validated_data['variant'], request.user.pk, serializer.validated_data['quantity']
+            )
+        except OutOfStock as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({**serializer.validated_data, 'expires_in': RESERVATION_TTL}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        try:
+            variant_id = int(request.query_params.get('variant', request.data.get('variant')))
+        except (TypeError, ValueError):
+            return Response({'error': 'variant is required'}, status=status.HTTP_400_BAD_REQUEST)
+        StockReservations().release(request.user.pk, [variant_id])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ProductLikeToggleView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -299,6 +609,7 @@ class ProductLikeToggleView(APIView):
 class ProductCommentListCreateView(generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cursor_ordering = '-created_at'
 
 
     def get_queryset(self):
@@ -327,13 +638,40 @@ class AddressDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return Address.objects.filter(user=self.request.user)
 
-class ProductTag(APIView):
+class ProductTag(PricedCacheMixin, generics.ListAPIView):
+    """
+    Products carrying the requested tags (?tag=a&tag=b or ?tag=a,b): all of
+    them by default, any of them with ?match=any.
+    """
+    serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = '-product_id'
+    cache_prefix = 'product_tag'
+
+    def get_tags(self):
+        tags = []
+        for value in self.request.query_params.getlist('tag'):
+            tags.extend(tag.strip() for tag in value.split(','))
+        return [tag for tag in tags if tag]
+
+    def get_queryset(self):
+        queryset = Product.objects.select_related('category').prefetch_related('variants').order_by('-product_id')
+        tags = self.get_tags()
+        if not tags:
+            return queryset
+        # Both lookups are served by the GIN index on Product.tags
+        if self.request.query_params.get('match') == 'any':
+            return queryset.filter(tags__overlap=tags)
+        return queryset.filter(tags__contains=tags)
+
+class ProductTagCountView(APIView):
+    """Per-tag product counts for facet display, most used tags first."""
+    MAX_LIMIT = 100
+
     def get(self, request):
-        tag_name = request.query_params.get('tag')
-        if tag_name:
-            products = Product.objects.filter(tags__contains=[tag_name])
-        else:
-            products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.MAX_LIMIT)
+        except (ValueError, TypeError):
+            limit = 20
+        counts = ProductTagCount.objects.filter(product_count__gt=0).order_by('-product_count', 'tag')[:limit]
+        return Response([{'tag': count.tag, 'count': count.product_count} for count in counts])